@@ -0,0 +1,604 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# benchmarks.py
+# Measures the performance of
+# finding and canonizing phones
+# run: python benchmarks.py
+#
+##################################
+
+import os, re, sys, time, json, random, argparse, tempfile, subprocess, finder, scanner, corpus, phone_formats, canonization, \
+    registry, snapshot, slowlog, regex_backends, index
+
+# Texts that make backtracking regexes slow. Every generator gets a size and returns a text of that size
+ADVERSARIAL_TEXTS = {
+    'zero_run': lambda size: 'x' + '0' * (size - 1),
+    'zero_blocks': lambda size: ('a' + '0' * 50) * (size // 51),
+    'separated_zeroes': lambda size: '0-' * (size // 2),
+    'near_miss_chain': lambda size: '972-5' + '-1' * ((size - 5) // 2),
+}
+
+ADVERSARIAL_SIZES = (1000, 2000, 4000, 8000)
+NUMBERS_COUNT = 2000
+PROSE_WORDS = 20000
+PREFILTER_DENSITIES = (0.0, 0.001, 0.01, 0.1)
+STARTUP_COUNTRIES = (3, 50, 200)
+STARTUP_RUNS = 5
+# Pieces of the random inputs of the fast path differential check
+FAST_PATH_PIECES = ['0', '00', '+', ' ', '-', '/', '.', '--', ' - ', ',', '\t', '972', '32', '33', '5', '52', '7', '800',
+                    '70', '46', '4', '3', '6']
+FAST_PATH_SEED = 7
+# Prefixes of the random format lists of the factoring check: shared prefixes, optional digits, empty prefix
+FACTORING_PREFIXES = ['5', '5[^\\D]', '[23489]', '7', '[^\\D0]', '(70|78|90)', '800', '4[6789]', '[67]', '[89]', '1\\d',
+                      '0', '05', '(?:1|22|333)', '8[0-2]\\d', '5\\d?', '', '[13579]']
+FACTORING_LISTS = 400
+FACTORING_SEED = 3
+# Fields that are measured, and not part of the identity of a result
+MEASURED_FIELDS = ('seconds', 'ops_per_second', 'found', 'mismatches', 'bytes', 'declined')
+# An engine is not measured on bigger texts once a single text took this many seconds
+TIME_LIMIT = 5.0
+
+
+def _timed(function, *args):
+    """
+    :return: tuple of (seconds, result)
+    """
+    start = time.time()
+    result = function(*args)
+    return time.time() - start, result
+
+
+def _result(benchmark, seconds, ops, **fields):
+    """
+    :return: result dict of a benchmark that ran ops operations in seconds
+    """
+    fields.update({'benchmark': benchmark, 'seconds': seconds, 'ops': ops,
+                   'ops_per_second': ops / seconds if seconds else None})
+    return fields
+
+
+def _corpora(is_canonized=True):
+    """
+    :return: generator of (country, country_phone, PhoneCorpus) of all countries
+    """
+    for country, country_phone in sorted(phone_formats.create_all_phones(is_canonized=is_canonized).iteritems()):
+        yield country, country_phone, corpus.PhoneCorpus(country_phone)
+
+
+def bench_find(words=PROSE_WORDS):
+    """
+    Times CountryPhone.to_find_regex over prose, for every country, canonized and not
+    :return: list of result dicts
+    """
+    results = []
+    for is_canonized in (True, False):
+        for country, country_phone, phone_corpus in _corpora(is_canonized):
+            text = phone_corpus.prose(words)
+            find_regex = country_phone.to_find_regex()
+            seconds, found = _timed(find_regex.findall, text)
+            results.append(_result('find', seconds, len(text), country=country, is_canonized=is_canonized,
+                                   found=len(found)))
+    return results
+
+
+def bench_exact(count=NUMBERS_COUNT):
+    """
+    Times CountryPhone.to_exact_regex over every kind of generated numbers, for every country, canonized and not
+    :return: list of result dicts
+    """
+    results = []
+    for is_canonized in (True, False):
+        for country, country_phone, phone_corpus in _corpora(is_canonized):
+            exact_regex = country_phone.to_exact_regex()
+            for kind in corpus.NUMBER_KINDS:
+                numbers = phone_corpus.numbers(count, kind)
+                seconds, found = _timed(lambda: [number for number in numbers if exact_regex.search(number)])
+                results.append(_result('exact', seconds, count, country=country, is_canonized=is_canonized,
+                                       numbers=kind, found=len(found)))
+    return results
+
+
+def bench_canonize(count=NUMBERS_COUNT):
+    """
+    Times CountryCanonizer.canonize and canonizemany over every kind of generated numbers, for every country
+    :return: list of result dicts
+    """
+    results = []
+    canonizers = canonization.create_all_canonizers()
+    for country, country_phone, phone_corpus in _corpora():
+        canonizer = canonizers[country]
+        for kind in corpus.NUMBER_KINDS:
+            numbers = phone_corpus.numbers(count, kind)
+            seconds, canonized = _timed(lambda: [canonizer.canonize(number) for number in numbers])
+            results.append(_result('canonize', seconds, count, country=country, numbers=kind))
+            seconds, canonized = _timed(canonizer.canonizemany, numbers)
+            results.append(_result('canonizemany', seconds, count, country=country, numbers=kind))
+    return results
+
+
+def bench_adversarial(sizes=ADVERSARIAL_SIZES):
+    """
+    Compares the regex PhoneFinder and the LinearScanner on adversarial texts, for separator tolerant patterns.
+    The scanner time must grow linearly with the size, while the regex time may explode
+    :return: list of result dicts
+    """
+    options = dict(is_canonized=False, optional_country=True, stuck_zero=True)
+    engines = [('regex', finder.PhoneFinder(**options)), ('linear', scanner.LinearScanner(**options))]
+    results = []
+
+    for name in sorted(ADVERSARIAL_TEXTS):
+        slow_engines = set()
+        for size in sizes:
+            text = ADVERSARIAL_TEXTS[name](size)
+            for engine_name, engine in engines:
+                if engine_name in slow_engines:
+                    continue
+                seconds, found = _timed(engine.findall, text)
+                results.append(_result('adversarial', seconds, len(text), text=name, engine=engine_name,
+                                       found=len(found)))
+                if seconds > TIME_LIMIT:
+                    slow_engines.add(engine_name)
+
+    return results
+
+
+# Code run in a fresh process, by mode: lazy builds a single country, eager builds every country,
+# snapshot loads every country from a snapshot
+STARTUP_CODE = {
+    'lazy': 'import registry; registry.CountryRegistry({path!r}).get_canonizer({country!r})',
+    'eager': 'import registry; registry.CountryRegistry({path!r}).all_canonizers()',
+    'snapshot': 'import registry; registry.CountryRegistry({path!r}, {snapshot_path!r}).all_canonizers()',
+}
+
+
+def _write_synthetic_countries(path, count):
+    """
+    writes a definitions file of count countries, copies of the builtin ones with made up country codes
+    """
+    builtin = phone_formats.country_definitions()
+    definitions = {}
+    for country_index in xrange(count):
+        name = sorted(builtin)[country_index % len(builtin)]
+        definition = dict(builtin[name], country_code=str(100 + country_index))
+        definitions['{0}_{1}'.format(name, country_index)] = definition
+    with open(path, 'w') as definitions_file:
+        json.dump(definitions, definitions_file)
+    return sorted(definitions)
+
+
+def bench_startup(counts=STARTUP_COUNTRIES, runs=STARTUP_RUNS):
+    """
+    Times fresh processes that get a single canonizer from a CountryRegistry (lazy), build all of them (eager)
+    or load all of them from a snapshot, for definition files of growing amounts of countries.
+    lazy time must not grow with the amount of countries
+    :return: list of result dicts
+    """
+    results = []
+    directory = os.path.dirname(os.path.abspath(__file__))
+    handle, path = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    snapshot_path = path + '.snapshot'
+    try:
+        for count in counts:
+            countries = _write_synthetic_countries(path, count)
+            snapshot.save_snapshot(registry.CountryRegistry(path).all_canonizers(), snapshot_path)
+            for mode in sorted(STARTUP_CODE):
+                code = STARTUP_CODE[mode].format(path=path, snapshot_path=snapshot_path, country=countries[0])
+                seconds, _ = _timed(lambda: [subprocess.check_call([sys.executable, '-c', code], cwd=directory)
+                                             for _ in xrange(runs)])
+                results.append(_result('startup', seconds, runs, countries=count, mode=mode))
+    finally:
+        for created_path in (path, snapshot_path):
+            if os.path.exists(created_path):
+                os.remove(created_path)
+    return results
+
+
+def bench_replay(path):
+    """
+    Times the inputs captured by a slowlog.SlowInputRecorder, so slow inputs become regression benchmarks
+    :return: list of result dicts
+    """
+    return [_result('replay', replayed['seconds'], 1, operation=replayed['operation'], target=replayed['target'],
+                    input=replayed['input_sha1'], input_length=replayed['input_length'])
+            for replayed in slowlog.replay(slowlog.load_entries(path))]
+
+
+def bench_prefilter(words=PROSE_WORDS, densities=PREFILTER_DENSITIES):
+    """
+    Times finder.PhoneFinder with and without its digit cluster prefilter, over prose of growing phone densities
+    :return: list of result dicts
+    """
+    results = []
+    for is_canonized in (True, False):
+        engines = [(prefilter, finder.PhoneFinder(is_canonized=is_canonized, prefilter=prefilter))
+                   for prefilter in (False, True)]
+        for country, country_phone, phone_corpus in _corpora(is_canonized):
+            for density in densities:
+                text = phone_corpus.prose(words, density)
+                for prefilter, engine in engines:
+                    seconds, found = _timed(engine.findall, text)
+                    results.append(_result('prefilter', seconds, len(text), country=country, density=density,
+                                           is_canonized=is_canonized, prefilter=prefilter, found=len(found)))
+    return results
+
+
+def bench_backends(words=PROSE_WORDS, count=NUMBERS_COUNT):
+    """
+    Compares the installed regex backends (see regex_backends): compiling the canonizers and the finder,
+    finding phones in prose, and canonizing with the regex pipeline (without the regex free fast path)
+    :return: list of result dicts. compiled tells how many patterns every backend compiled (fallbacks included)
+    """
+    results = []
+    previous = regex_backends.get_backends()
+    try:
+        for backend in regex_backends.available_backends():
+            regex_backends.set_backends([backend])
+            compiled_before = regex_backends.info()
+            seconds, (canonizers, phone_finder) = _timed(lambda: (canonization.create_all_canonizers(),
+                                                                  finder.PhoneFinder(prefilter=False)))
+            compiled = dict((name, total - compiled_before.get(name, 0))
+                            for name, total in regex_backends.info().iteritems()
+                            if total > compiled_before.get(name, 0))
+            results.append(_result('backend_compile', seconds, len(canonizers), backend=backend, compiled=compiled))
+
+            for country, country_phone, phone_corpus in _corpora():
+                text = phone_corpus.prose(words)
+                seconds, found = _timed(phone_finder.findall, text)
+                results.append(_result('backend_find', seconds, len(text), backend=backend, country=country,
+                                       found=len(found)))
+
+                canonizer = canonizers[country]
+                for kind in corpus.NUMBER_KINDS:
+                    numbers = phone_corpus.numbers(count, kind)
+                    seconds, canonized = _timed(lambda: [canonizer._canonize_regexes(number) for number in numbers])
+                    results.append(_result('backend_canonize', seconds, count, backend=backend, country=country,
+                                           numbers=kind))
+    finally:
+        regex_backends.set_backends(previous)
+    return results
+
+
+def bench_alternation(words=PROSE_WORDS, count=NUMBERS_COUNT):
+    """
+    Compares the plain OR-ed alternatives of the canonized formats with the prefix factored ones
+    (see FormatList._create_factored_regex), on the exact regex, the find regex and the canonizer regex pipeline.
+    mismatches counts the results that differ from the plain alternatives (test_phone_formats.py asserts there
+    are none)
+    :return: list of result dicts
+    """
+    results = []
+    plain_results = {}
+    try:
+        for factored in (False, True):
+            phone_formats.FormatList.factor_alternatives = factored
+            canonizers = canonization.create_all_canonizers()
+            for country, country_phone, phone_corpus in _corpora():
+                text = phone_corpus.prose(words, 0.05)
+                numbers = [number for kind in corpus.NUMBER_KINDS for number in phone_corpus.numbers(count, kind)]
+                exact_regex = country_phone.to_exact_regex()
+                find_regex = country_phone.to_find_regex()
+                canonizer = canonizers[country]
+
+                runs = [('alternation_exact', len(numbers),
+                         lambda: [exact_regex.search(number) is not None for number in numbers]),
+                        ('alternation_find', len(text),
+                         lambda: [match.span('phone') for match in find_regex.finditer(text)]),
+                        ('alternation_canonize', len(numbers),
+                         lambda: [canonizer._canonize_regexes(number) for number in numbers])]
+                for benchmark, ops, run in runs:
+                    seconds, found = _timed(run)
+                    plain_found = plain_results.setdefault((benchmark, country), found)
+                    mismatches = sum(result != plain_result for result, plain_result in zip(found, plain_found))
+                    results.append(_result(benchmark, seconds, ops, country=country, factored=factored,
+                                           mismatches=mismatches + abs(len(found) - len(plain_found))))
+    finally:
+        phone_formats.FormatList.factor_alternatives = True
+    return results
+
+
+def _random_pieces(rng, count):
+    """
+    :return: list of count inputs glued out of FAST_PATH_PIECES and digit runs
+    """
+    inputs = []
+    for _ in xrange(count):
+        parts = []
+        for _ in xrange(rng.randint(1, 6)):
+            if rng.random() < 0.5:
+                parts.append(rng.choice(FAST_PATH_PIECES))
+            else:
+                parts.append(''.join(rng.choice(corpus.DIGITS) for _ in xrange(rng.randint(1, 9))))
+        inputs.append(''.join(parts))
+    return inputs
+
+
+def _fast_path_inputs(phone_corpus, rng, count):
+    """
+    :return: dict of input set name to list of inputs. reversed (number, separator, prefix without trunk zero)
+    holds inputs the fast path must decline, unicode and newline inputs it must never see
+    """
+    inputs = dict((kind, phone_corpus.numbers(count, kind)) for kind in corpus.NUMBER_KINDS)
+    inputs['random'] = _random_pieces(rng, count)
+    reversed_numbers = []
+    for _ in xrange(count):
+        prefix, national_number = phone_corpus.national()
+        reversed_numbers.append(national_number + rng.choice(['-', ' - ', '/', '.']) + prefix)
+    inputs['reversed'] = reversed_numbers
+    inputs['unicode'] = [unicode(phone_number) for phone_number in inputs['valid'] + inputs['reversed_prefix']]
+    newlined = []
+    for number in inputs['valid']:
+        position = rng.randint(0, len(number))
+        newlined.append(number[:position] + '\n' + number[position:])
+    inputs['newline'] = newlined
+    return inputs
+
+
+def bench_fast_path(count=NUMBERS_COUNT, seed=FAST_PATH_SEED):
+    """
+    Differential check of the regex free fast path (CountryCanonizer._canonize_fast) against the regex pipeline
+    (_canonize_regexes), and of canonize() against a canonizer without fast path, on seeded inputs of every
+    country. mismatches must be 0: it counts the results that differ, the reversed inputs the fast path did not
+    decline, and the fast path calls made with unicode or newline inputs.
+    declined counts the inputs the fast path gave back to the regexes
+    :return: list of result dicts
+    """
+    results = []
+    rng = random.Random(seed)
+    for country, country_phone, phone_corpus in _corpora():
+        canonizer = canonization.CountryCanonizer(country_phone)
+        regex_canonizer = canonization.CountryCanonizer(country_phone)
+        regex_canonizer._format_trie = None
+        reversing_regex = canonizer._regexes_dict['reversed'][0]
+
+        fast_calls = []
+
+        def counting_canonize_fast(phone_number):
+            fast_calls.append(phone_number)
+            return canonization.CountryCanonizer._canonize_fast(canonizer, phone_number)
+        # an instance attribute hides the method, like enable_instrumentation does
+        canonizer._canonize_fast = counting_canonize_fast
+
+        for name, numbers in sorted(_fast_path_inputs(phone_corpus, rng, count).iteritems()):
+            mismatches = declined = 0
+            if name not in ('unicode', 'newline'):
+                for number in numbers:
+                    fast = canonization.CountryCanonizer._canonize_fast(canonizer, number)
+                    if fast is None:
+                        declined += 1
+                    elif fast != canonizer._canonize_regexes(number):
+                        mismatches += 1
+                    elif name == 'reversed' and reversing_regex.search(number):
+                        mismatches += 1
+
+            del fast_calls[:]
+            seconds, canonized = _timed(lambda: [canonizer.canonize(number) for number in numbers])
+            expected = [regex_canonizer.canonize(number) for number in numbers]
+            mismatches += sum(result != expected_result for result, expected_result in zip(canonized, expected))
+            mismatches += sum(1 for phone_number in fast_calls
+                              if isinstance(phone_number, unicode) or '\n' in phone_number)
+            results.append(_result('fast_path', seconds, len(numbers), country=country, numbers=name,
+                                   mismatches=mismatches, declined=declined))
+    return results
+
+
+def _random_format_list(rng):
+    """
+    :return: FormatList of 1 to 5 random formats, with overlapping length ranges
+    """
+    format_list = phone_formats.FormatList()
+    for _ in xrange(rng.randint(1, 5)):
+        min_length = rng.randint(0, 6)
+        format_list.append(phone_formats.PhoneFormat(rng.choice(FACTORING_PREFIXES), min_length,
+                                                     min_length + rng.randint(0, 3)))
+    return format_list
+
+
+def bench_factoring(lists=FACTORING_LISTS, count=NUMBERS_COUNT, seed=FACTORING_SEED):
+    """
+    Equivalence check of the prefix factored alternatives (FormatList._create_factored_regex) against the plain
+    OR-ed ones (_or_regexes), on seeded random format lists and random digit strings: whole string matches
+    (factoring_exact) and match spans in a text (factoring_find). mismatches counts the differences
+    (test_phone_formats.py asserts there are none)
+    :return: list of result dicts
+    """
+    rng = random.Random(seed)
+    checked = factored_lists = exact_mismatches = find_mismatches = 0
+    start = time.time()
+    for _ in xrange(lists):
+        format_list = _random_format_list(rng)
+        factored = format_list._create_factored_regex()
+        plain = format_list._or_regexes(format_list._create_regexes(True))
+        if factored is None or factored == plain:
+            continue
+        factored_lists += 1
+        factored_exact, plain_exact = re.compile('^{0}$'.format(factored)), re.compile('^{0}$'.format(plain))
+        factored_find = re.compile(r'(?<!\d){0}(?!\d)'.format(factored))
+        plain_find = re.compile(r'(?<!\d){0}(?!\d)'.format(plain))
+        for _ in xrange(count):
+            digits = ''.join(rng.choice(corpus.DIGITS) for _ in xrange(rng.randint(0, 12)))
+            text = 'x' + digits + ' ' + digits[::-1] + 'y'
+            checked += 1
+            exact_mismatches += bool(factored_exact.match(digits)) != bool(plain_exact.match(digits))
+            find_mismatches += ([match.span() for match in factored_find.finditer(text)] !=
+                                [match.span() for match in plain_find.finditer(text)])
+    seconds = time.time() - start
+    return [_result('factoring_exact', seconds, checked, lists=factored_lists, mismatches=exact_mismatches),
+            _result('factoring_find', seconds, checked, lists=factored_lists, mismatches=find_mismatches)]
+
+
+def bench_classify(count=NUMBERS_COUNT):
+    """
+    Times CountryPhone.classifymany against calling is_valid_line and is_valid_mobile on every number,
+    over every kind of generated numbers, for every country
+    :return: list of result dicts
+    """
+    results = []
+    for country, country_phone, phone_corpus in _corpora():
+        for kind in corpus.NUMBER_KINDS:
+            numbers = phone_corpus.numbers(count, kind)
+            seconds, found = _timed(lambda: [(country_phone.is_valid_line(number),
+                                              country_phone.is_valid_mobile(number)) for number in numbers])
+            results.append(_result('classify', seconds, count, country=country, numbers=kind, method='is_valid'))
+            seconds, found = _timed(country_phone.classifymany, numbers)
+            results.append(_result('classify', seconds, count, country=country, numbers=kind, method='classify'))
+    return results
+
+
+def _sets_bytes(results):
+    """
+    :return: approximate memory of a list of canonization results (sets of strings), in bytes
+    """
+    return sys.getsizeof(results) + sum(sys.getsizeof(result) + sum(sys.getsizeof(number) for number in result)
+                                        for result in results if result is not None)
+
+
+def bench_compact(count=NUMBERS_COUNT):
+    """
+    Compares CountryCanonizer.canonizemany with canonizemany_compact: time and memory of the results
+    :return: list of result dicts
+    """
+    results = []
+    canonizers = canonization.create_all_canonizers()
+    for country, country_phone, phone_corpus in _corpora():
+        canonizer = canonizers[country]
+        for kind in corpus.NUMBER_KINDS:
+            numbers = phone_corpus.numbers(count, kind)
+            seconds, canonized = _timed(canonizer.canonizemany, numbers)
+            results.append(_result('compact', seconds, count, country=country, numbers=kind, method='sets',
+                                   bytes=_sets_bytes(canonized)))
+            seconds, compact = _timed(canonizer.canonizemany_compact, numbers)
+            results.append(_result('compact', seconds, count, country=country, numbers=kind, method='compact',
+                                   bytes=compact.nbytes() + _sets_bytes(compact.fallback.values())))
+    return results
+
+
+def _canonize_join(canonizer, left, right):
+    """
+    joins two lists of raw numbers by canonizing both of them
+    :return: list of the sets of left indexes sharing a canonized number with every right number
+    """
+    left_indexes = {}
+    for left_index, phone_number in enumerate(left):
+        for number in canonizer.canonize(phone_number) or ():
+            left_indexes.setdefault(number, set()).add(left_index)
+    results = []
+    for phone_number in right:
+        matched = set()
+        for number in canonizer.canonize(phone_number) or ():
+            matched.update(left_indexes.get(number, ()))
+        results.append(matched)
+    return results
+
+
+def bench_join(count=NUMBERS_COUNT):
+    """
+    Compares joining raw numbers by canonizing both sides with a lookup in a CanonizedIndex of one side.
+    The index is built once (build), every join after that is a lookup
+    :return: list of result dicts
+    """
+    results = []
+    canonizers = canonization.create_all_canonizers()
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    for country, country_phone, phone_corpus in _corpora():
+        canonizer = canonizers[country]
+        left = phone_corpus.numbers(count)
+        right = left[::2] + phone_corpus.numbers(count // 2)
+
+        seconds, expected = _timed(_canonize_join, canonizer, left, right)
+        results.append(_result('join', seconds, len(right), country=country, method='canonize',
+                               found=sum(1 for matched in expected if matched)))
+
+        os.remove(path)
+        canonized_index = index.CanonizedIndex(path, canonizer)
+        seconds, _ = _timed(canonized_index.add_many, enumerate(left))
+        results.append(_result('join', seconds, count, country=country, method='build'))
+        seconds, joined = _timed(canonized_index.lookup_many, right)
+        results.append(_result('join', seconds, len(right), country=country, method='index',
+                               found=sum(1 for matched in joined if matched),
+                               mismatches=sum(1 for got, want in zip(joined, expected) if got != want)))
+        canonized_index.close()
+    os.remove(path)
+    return results
+
+
+BENCHMARKS = {'find': bench_find,
+              'exact': bench_exact,
+              'canonize': bench_canonize,
+              'classify': bench_classify,
+              'compact': bench_compact,
+              'fast_path': bench_fast_path,
+              'factoring': bench_factoring,
+              'join': bench_join,
+              'adversarial': bench_adversarial,
+              'alternation': bench_alternation,
+              'backends': bench_backends,
+              'prefilter': bench_prefilter,
+              'startup': bench_startup}
+
+
+def _result_key(result):
+    """
+    :return: identity of a result: every field but the measured ones
+    """
+    return tuple(sorted((field, value) for field, value in result.iteritems() if field not in MEASURED_FIELDS))
+
+
+def _load_results(path):
+    with open(path) as results_file:
+        return [json.loads(line) for line in results_file if line.strip()]
+
+
+def compare(base_path, new_path):
+    """
+    Compares two runs (files of JSON lines)
+    :return: generator of dicts of every result found in both runs, with the ratio between their times
+    """
+    base_results = dict((_result_key(result), result) for result in _load_results(base_path))
+    for result in _load_results(new_path):
+        base_result = base_results.get(_result_key(result))
+        if base_result is None:
+            continue
+        comparison = dict(result)
+        comparison['base_seconds'] = base_result['seconds']
+        comparison['ratio'] = result['seconds'] / base_result['seconds'] if base_result['seconds'] else None
+        yield comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run phone extraction benchmarks, print results as JSON lines')
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help='benchmarks to run, out of {0} (default: all)'.format(', '.join(sorted(BENCHMARKS))))
+    parser.add_argument('--output', help='file to write results to, instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help='compare two result files instead of running benchmarks. ratio > 1 is a slowdown')
+    parser.add_argument('--replay', metavar='SLOWLOG',
+                        help='time the inputs of a slow input file (see slowlog.py) instead of running benchmarks')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        results = compare(*args.compare)
+    elif args.replay:
+        results = bench_replay(args.replay)
+    else:
+        unknown = set(args.benchmarks) - set(BENCHMARKS)
+        if unknown:
+            parser.error('unknown benchmarks: {0}'.format(', '.join(sorted(unknown))))
+        names = args.benchmarks or sorted(BENCHMARKS)
+        results = (result for name in names for result in BENCHMARKS[name]())
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for result in results:
+            output.write(json.dumps(result, sort_keys=True) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# bulk.py
+# Canonize big amounts of phone
+# numbers on many processes
+#
+##################################
+
+import itertools, collections, multiprocessing, canonization, phone_formats, snapshot
+
+DEFAULT_CHUNK_SIZE = 1000
+# Chunks queued per worker. Bounds the items in flight, so memory doesn't grow with the input
+PENDING_CHUNKS_PER_WORKER = 2
+
+# State of the current worker process, built once by _init_worker
+_worker_state = None
+
+
+def _init_worker(factory, args):
+    """
+    pool initializer. builds the state of the worker once, instead of pickling it with every task
+    """
+    global _worker_state
+    _worker_state = factory(*args)
+
+
+def _call_worker(function, chunk):
+    """
+    runs a task inside a worker
+    """
+    return function(_worker_state, chunk)
+
+
+def _create_canonizer(country, cache_size=None, snapshot_path=None):
+    """
+    :return: canonizer of country, loaded from the snapshot if given
+    """
+    if snapshot_path is None:
+        return canonization.create_canonizer(country, cache_size=cache_size)
+    return snapshot.load_snapshot(snapshot_path, countries=[country], cache_size=cache_size)[country]
+
+
+def _canonize_chunk(canonizer, phone_numbers):
+    """
+    canonizes a list of phone numbers
+    """
+    return map(canonizer.canonize, phone_numbers)
+
+
+def _canonize_chunk_compact(canonizer, phone_numbers):
+    """
+    canonizes a list of phone numbers into a CompactCanonized
+    """
+    return canonizer.canonizemany_compact(phone_numbers)
+
+
+def iter_chunks(iterable, chunk_size):
+    """
+    splits iterable into lists of chunk_size items
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+class ChunkPool(object):
+    """
+    Runs function(state, chunk) over chunks on a pool of processes. Every worker builds its state once,
+    with factory(*args). Unlike multiprocessing.Pool.imap, chunks are taken from the input only when
+    a worker is about to be free (at most PENDING_CHUNKS_PER_WORKER per worker are in flight),
+    so any input is processed with constant memory
+    """
+
+    def __init__(self, factory, args=(), workers=None):
+        """
+        :param factory: module level function building the state of a worker
+        :param args: arguments of factory, picklable
+        :param workers: number of processes, defaults to the number of cpus. 1 runs in this process
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.factory = factory
+        self.args = tuple(args)
+        self.workers = workers
+        self._pool = None
+        self._local_state = None
+
+    def __repr__(self):
+        return 'ChunkPool({0}, workers={1})'.format(self.factory.__name__, self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                              initargs=(self.factory, self.args))
+        return self._pool
+
+    def local_state(self):
+        """
+        :return: the state of this process, built on first use (used when workers is 1)
+        """
+        if self._local_state is None:
+            self._local_state = self.factory(*self.args)
+        return self._local_state
+
+    def imap(self, function, chunks):
+        """
+        :param function: module level function of (state, chunk)
+        :param chunks: iterable of chunks, consumed lazily
+        :return: generator of the results of function on every chunk, in input order
+        """
+        if self.workers == 1:
+            for chunk in chunks:
+                yield function(self.local_state(), chunk)
+            return
+
+        max_pending = self.workers * PENDING_CHUNKS_PER_WORKER
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(self._get_pool().apply_async(_call_worker, (function, chunk)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def close(self):
+        """
+        stops the worker processes
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+class BulkCanonizer(object):
+    """
+    Canonizes phone numbers of a single country on a pool of processes.
+    Results keep the order of the input, like CountryCanonizer.canonizemany
+    """
+
+    def __init__(self, country, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, cache_size=None, snapshot_path=None):
+        """
+        :param country: country name, as in canonization.create_all_canonizers
+        :param workers: number of processes, defaults to the number of cpus. 1 canonizes in this process
+        :param chunk_size: amount of phone numbers sent to a worker at once
+        :param cache_size: size of the canonize() cache of every worker (see CountryCanonizer)
+        :param snapshot_path: snapshot to load the canonizer of every worker from (see snapshot.save_snapshot)
+        """
+        if country not in phone_formats.country_definitions():
+            raise ValueError('No canonizer for country {0!r}'.format(country))
+
+        self.country = country
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.snapshot_path = snapshot_path
+        self._chunk_pool = ChunkPool(_create_canonizer, (country, cache_size, snapshot_path), workers)
+        self.workers = self._chunk_pool.workers
+
+    def __repr__(self):
+        return 'BulkCanonizer({0}, workers={1})'.format(self.country, self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def imap(self, phone_numbers):
+        """
+        :param phone_numbers: iterable of phone numbers, consumed lazily (a few chunks per worker ahead)
+        :return: generator of canonization results (as in CountryCanonizer.canonize), in input order
+        """
+        chunks = iter_chunks(phone_numbers, self.chunk_size)
+        for chunk_results in self._chunk_pool.imap(_canonize_chunk, chunks):
+            for result in chunk_results:
+                yield result
+
+    def canonizemany(self, phone_numbers):
+        """
+        :param phone_numbers: List of phone numbers we want to canonize
+        :return: List containing a set with every canonization possibily
+        """
+        return list(self.imap(phone_numbers))
+
+    def canonizemany_compact(self, phone_numbers):
+        """
+        :param phone_numbers: iterable of phone numbers, consumed lazily (a few chunks per worker ahead)
+        :return: canonization.CompactCanonized of all phone numbers, in input order
+        """
+        compact = canonization.CompactCanonized()
+        chunks = iter_chunks(phone_numbers, self.chunk_size)
+        for chunk_compact in self._chunk_pool.imap(_canonize_chunk_compact, chunks):
+            compact.extend(chunk_compact)
+        return compact
+
+    def close(self):
+        """
+        stops the worker processes
+        """
+        self._chunk_pool.close()
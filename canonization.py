@@ -8,7 +8,228 @@
 #
 ##################################
 
-import re, phone_formats
+import os, re, sys, array, itertools, collections, phone_formats, format_trie, instrumentation, regex_backends
+
+# Characters stripped by the trimmer regex ([\s+0])
+TRIMMED_CHARS = ' \t\n\r\f\v+0'
+DIGITS = '0123456789'
+NON_DIGITS = ''.join(chr(i) for i in xrange(256) if chr(i) not in DIGITS)
+# Characters that can't separate a reversed number from its prefix (see phone_formats.OBLIGATED_SEPARATOR)
+NON_REVERSING_SEPARATORS = frozenset('\t\r\n,')
+
+# C long signed integers: 64 bits on most 64 bit builds, 32 bits on windows and 32 bit builds
+OFFSET_TYPECODE = 'l'
+VALUE_TYPECODE = 'l'
+# Longest digit string that always fits in a VALUE_TYPECODE integer (18 digits in 64 bits, 9 in 32 bits)
+MAX_COMPACT_DIGITS = len(str(2 ** (8 * array.array(VALUE_TYPECODE).itemsize - 1) - 1)) - 1
+
+# Separator between the first and last endings of a range (0547754720-729)
+RANGE_SEPARATOR = '-'
+# Most numbers a single range may expand to, larger ranges are read as plain endings
+DEFAULT_MAX_EXPANSION = 1000
+
+CanonizedColumn = collections.namedtuple('CanonizedColumn', ['primary', 'codes', 'offsets', 'alternatives'])
+
+# Marks a key missing from the cache (None is a valid canonization result)
+_MISSING = object()
+
+
+def only_digits(phone_number):
+    """
+    :return: the digits of phone_number, without anything between them
+    """
+    if isinstance(phone_number, unicode):
+        return u''.join(char for char in phone_number if char in DIGITS)
+    return phone_number.translate(None, NON_DIGITS)
+
+
+class LRUCache(object):
+    """
+    Bounded mapping that evicts the least recently used entry when full
+    """
+
+    def __init__(self, max_size):
+        if max_size <= 0:
+            raise ValueError('max_size must be positive')
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        :return: value of key (marking it as recently used), or default
+        """
+        value = self._entries.pop(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._entries[key] = value
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self):
+        """
+        :return: dict of cache statistics
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._entries),
+                'max_size': self.max_size}
+
+
+class NumberRange(collections.namedtuple('NumberRange', ['first', 'last'])):
+    """
+    Consecutive phone numbers of the same length, first and last included.
+    Counted without building its numbers, and expanded lazily
+    """
+
+    __slots__ = ()
+
+    def size(self):
+        """
+        :return: amount of numbers in the range
+        """
+        if self.first == self.last:
+            return 1
+        return int(self.last) - int(self.first) + 1
+
+    def numbers(self):
+        """
+        :return: generator of the numbers of the range, in order
+        """
+        if self.first == self.last:
+            yield self.first
+            return
+
+        # only the digits after the common prefix change
+        stem_length = min(len(os.path.commonprefix([self.first, self.last])), len(self.first) - 1)
+        stem = self.first[:stem_length]
+        width = len(self.first) - stem_length
+        value = int(self.first[stem_length:])
+        last = int(self.last[stem_length:])
+        while value <= last:
+            yield stem + str(value).zfill(width)
+            value += 1
+
+
+def _union_ranges(ranges):
+    """
+    :param ranges: iterable of NumberRange
+    :return: sorted list of disjoint NumberRange covering the same numbers
+    """
+    union = []
+    for number_range in sorted(ranges, key=lambda number_range: (len(number_range.first), number_range.first)):
+        if union and len(union[-1].last) == len(number_range.first):
+            previous = union[-1]
+            is_adjacent = (previous.last.isdigit() and number_range.first.isdigit() and
+                           int(number_range.first) == int(previous.last) + 1)
+            if number_range.first <= previous.last or is_adjacent:
+                union[-1] = NumberRange(previous.first, max(previous.last, number_range.last))
+                continue
+        union.append(number_range)
+    return union
+
+
+class CompactCanonized(object):
+    """
+    Canonization results of many phone numbers, without a set or a string per result.
+    Canonized numbers are kept as integers with their amount of digits (so leading zeroes come back),
+    in flat arrays: the numbers of row i are values[offsets[i]:offsets[i + 1]], primary number first.
+    Numbers that are not digits only, or too long for an integer, are kept as strings in fallback.
+    A row without numbers is a None result
+    """
+
+    __slots__ = ('values', 'widths', 'offsets', 'codes', 'fallback')
+
+    def __init__(self):
+        self.values = array.array(VALUE_TYPECODE)
+        self.widths = array.array('B')
+        self.offsets = array.array(OFFSET_TYPECODE, [0])
+        self.codes = array.array('b')
+        self.fallback = {}  # index in values -> number
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        """
+        :return: result of row index, like CountryCanonizer.canonize (set of numbers, or None)
+        """
+        numbers = self.row(index)
+        return set(numbers) if numbers else None
+
+    def __iter__(self):
+        for index in xrange(len(self)):
+            yield self[index]
+
+    def __getstate__(self):
+        return self.values, self.widths, self.offsets, self.codes, self.fallback
+
+    def __setstate__(self, state):
+        self.values, self.widths, self.offsets, self.codes, self.fallback = state
+
+    def append(self, numbers, code):
+        """
+        adds a row
+        :param numbers: canonized numbers of the row, primary number first (empty for a None result)
+        :param code: outcome code (see CountryCanonizer.canonize_with_code)
+        """
+        for number in numbers:
+            if 0 < len(number) <= MAX_COMPACT_DIGITS and not number.lstrip(DIGITS):
+                self.values.append(int(number))
+                self.widths.append(len(number))
+            else:
+                self.fallback[len(self.values)] = number
+                self.values.append(0)
+                self.widths.append(0)
+        self.offsets.append(len(self.values))
+        self.codes.append(code)
+
+    def extend(self, other):
+        """
+        adds all rows of another CompactCanonized
+        """
+        base = len(self.values)
+        self.values.extend(other.values)
+        self.widths.extend(other.widths)
+        self.offsets.extend(offset + base for offset in other.offsets[1:])
+        self.codes.extend(other.codes)
+        self.fallback.update((index + base, number) for index, number in other.fallback.iteritems())
+
+    def number(self, value_index):
+        """
+        :return: canonized number at value_index, as a string
+        """
+        width = self.widths[value_index]
+        if width == 0:
+            return self.fallback[value_index]
+        return '{0:0{1}d}'.format(self.values[value_index], width)
+
+    def row(self, index):
+        """
+        :return: list of the canonized numbers of row index, primary number first
+        """
+        return [self.number(value_index) for value_index in xrange(self.offsets[index], self.offsets[index + 1])]
+
+    def nbytes(self):
+        """
+        :return: approximate memory of the arrays, in bytes (fallback strings not included)
+        """
+        return sum(len(values) * values.itemsize for values in (self.values, self.widths, self.offsets, self.codes))
+
 
 class CountryCanonizer(object):
     """
@@ -19,12 +240,27 @@ class CountryCanonizer(object):
     SIMPLE_CANON = 0
     EXTRACTED = 1
     NOTHING = 2
+    OUTCOME_NAMES = {SIMPLE_CANON: 'simple_canon', EXTRACTED: 'extracted', NOTHING: 'nothing'}
 
-    def __init__(self, country_phone):
+    def __init__(self, country_phone, cache_size=None, expand_ranges=False, max_expansion=DEFAULT_MAX_EXPANSION):
+        """
+        :param country_phone: CountryPhone instance
+        :param cache_size: if given, canonize() remembers the results of the last cache_size distinct inputs,
+        and returns them as frozensets
+        :param expand_ranges: if set, endings joined by '-' are ranges: "0547754720-729" and "0547754720/1-9"
+        stand for every number in between (see canonize_ranges)
+        :param max_expansion: ranges of more numbers are read as plain endings, like when expand_ranges is not set
+        """
         self._country_phone = country_phone
+        self.expand_ranges = expand_ranges
+        self.max_expansion = max_expansion
         self._regexes_dict = {}
         self._regexes_lst = []
+        self._regexes_names = []
         self._init_regexes()
+        self._init_format_trie()
+        self._cache = LRUCache(cache_size) if cache_size else None
+        self._stats = None
 
     def __repr__(self):
         return self.__unicode__()
@@ -36,7 +272,9 @@ class CountryCanonizer(object):
         return '{0} canonizer'.format(self._country_phone.country)
 
     def _create_alternatives(self):
-        formats = self._country_phone.get_phone_formats()
+        # the cached format list of the exact regex, so its alternatives are created once
+        country_phone = self._country_phone
+        formats = country_phone._get_format_list(country_phone._is_strict, country_phone._is_canonized)
         return formats._create_orred_regexes(is_canonized=True)
 
     def _create_reversed_regexes(self):
@@ -47,6 +285,14 @@ class CountryCanonizer(object):
         reversed_regex = formats._create_orred_reversed_regexes()
         return reversed_regex
 
+    @staticmethod
+    def _compile(pattern, replace=None):
+        """
+        compiles a pattern with the preferred regex backend that can substitute with replace
+        """
+        features = [regex_backends.NAMED_SUBSTITUTION] if replace and '\\g<' in replace else []
+        return regex_backends.compile(pattern, features=features)
+
     def _init_regexes(self):
         """
         initializes phone regexes
@@ -57,45 +303,136 @@ class CountryCanonizer(object):
         # Every value in this dict is (search_regex, replace_regex, is_considered_canonizing, action_order)
 
         # Trims + and 0 from beginning, non numbers from end
-        trim_regex = re.compile(r'^[\s+0]*(?P<phone>.+)\D*$')
+        trim_regex = self._compile(r'^[\s+0]*(?P<phone>.+)\D*$', r'\g<phone>')
         self._regexes_dict['trimmer'] = (trim_regex, r'\g<phone>', False, 0)
 
         # Reverse prefix and number
         # Comes as first canonization technique because when we remove all non-digits, this regex might be spammy
-        reversing_regex = re.compile("^{0}$".format(self._create_reversed_regexes()))
+        reversing_regex = self._compile("^{0}$".format(self._create_reversed_regexes()),
+                                        '\\g<pre{i}>\\g<num{i}>')
         self._regexes_dict['reversed'] = (reversing_regex, '\\g<pre{i}>\\g<num{i}>', True, 1)  # many capturing names
 
         # Keep only numbers
-        only_numbers_regex = re.compile(r'\D')
+        only_numbers_regex = self._compile(r'\D')
         self._regexes_dict['only_numbers'] = (only_numbers_regex, '', False, 2)
 
         alternatives = self._create_alternatives()
 
         # Removes 0 after country code
-        stuck_zeroes_regex = re.compile("^({country})0*{alt}$".format(
+        stuck_zeroes_regex = self._compile("^({country})0*{alt}$".format(
             country=self._country_phone.country_code,
             alt=alternatives
         ))
         self._regexes_dict['stuck_zeroes'] = (stuck_zeroes_regex, r'\1\2', True, 3)  # remove zeroes
 
         # Adds country code
-        no_country_code_regex = re.compile(r'^({alt})$'.format(alt=alternatives))
+        no_country_code_regex = self._compile(r'^({alt})$'.format(alt=alternatives))
         self._regexes_dict['no_country_code'] = (
             no_country_code_regex, "{country}\\1".format(country=self._country_phone.country_code), True, 4)
 
         # END canonizing regexes
 
-        temp_lst = sorted(self._regexes_dict.values(), lambda x, y: x[3] - y[3])
-        self._regexes_lst = [(item[0], item[1], item[2]) for item in temp_lst if
-                             item[3] >= 0]  # remove priority as its based on index
+        self._order_regexes()
 
         # General rexes (negative priority)
         # Number parts
-        self._regexes_dict['number_parts'] = re.compile(r'\d+')
+        self._regexes_dict['number_parts'] = self._compile(r'\d+')
 
         # Country phone regex (canonized)
-        country_regex = self._country_phone.to_exact_regex()
-        self._regexes_dict['country_regex'] = re.compile(country_regex)
+        self._regexes_dict['country_regex'] = self._country_phone.to_exact_regex()
+
+    def _order_regexes(self):
+        """
+        builds _regexes_lst (and the rule names, in the same order) out of the canonizing regexes of _regexes_dict
+        """
+        temp_lst = sorted(self._regexes_dict.items(), key=lambda item: item[1][3])
+        self._regexes_lst = [(item[0], item[1], item[2]) for name, item in temp_lst if
+                             item[3] >= 0]  # remove priority as its based on index
+        self._regexes_names = [name for name, item in temp_lst if item[3] >= 0]
+
+    def snapshot_state(self):
+        """
+        :return: picklable dict of everything _init_regexes and _init_format_trie compute:
+        the patterns of the regexes with their metadata, by name, and the prefix literals of the formats
+        """
+        regexes = {}
+        for name, value in self._regexes_dict.iteritems():
+            if isinstance(value, tuple):
+                regex, replace, is_canonizing, order = value
+                regexes[name] = (regex.pattern, replace, is_canonizing, order)
+            else:
+                regexes[name] = (value.pattern, None, None, None)
+        return {'fingerprint': self._country_phone.fingerprint(),
+                'regexes': regexes,
+                'format_literals': None if self._format_trie is None else self._format_trie.format_literals()}
+
+    @classmethod
+    def from_snapshot_state(cls, country_phone, state, cache_size=None, expand_ranges=False,
+                            max_expansion=DEFAULT_MAX_EXPANSION):
+        """
+        Creates a canonizer out of snapshot_state(), without generating its patterns
+        :param country_phone: CountryPhone instance the state was taken from
+        :raise ValueError: when the state was taken from a different country_phone
+        """
+        if state['fingerprint'] != country_phone.fingerprint():
+            raise ValueError('Snapshot state of {0} does not match its formats'.format(country_phone))
+
+        canonizer = cls.__new__(cls)
+        canonizer._country_phone = country_phone
+        canonizer.expand_ranges = expand_ranges
+        canonizer.max_expansion = max_expansion
+        canonizer._regexes_dict = {}
+        general_regexes = {}
+        for name, (pattern, replace, is_canonizing, order) in state['regexes'].iteritems():
+            regex = cls._compile(pattern, replace)
+            if order is None:
+                general_regexes[name] = regex
+            else:
+                canonizer._regexes_dict[name] = (regex, replace, is_canonizing, order)
+        canonizer._order_regexes()
+        canonizer._regexes_dict.update(general_regexes)
+
+        canonizer._format_trie = None
+        canonizer._reversed_prefixes = frozenset()
+        if state['format_literals'] is not None:
+            canonizer._format_trie = format_trie.FormatTrie.from_country(country_phone, state['format_literals'])
+            canonizer._reversed_prefixes = canonizer._format_trie.literals()
+        canonizer._cache = LRUCache(cache_size) if cache_size else None
+        canonizer._stats = None
+        return canonizer
+
+    def _init_format_trie(self):
+        """
+        compiles the formats into a FormatTrie, used by the regex free fast path.
+        the fast path is disabled (_format_trie is None) if a prefix can't be compiled to a trie
+        """
+
+        self._format_trie = None
+        self._reversed_prefixes = frozenset()
+
+        if not self._country_phone.country_code.isdigit():
+            return
+
+        try:
+            self._format_trie = format_trie.FormatTrie.from_country(self._country_phone)
+        except ValueError:
+            return
+        self._reversed_prefixes = self._format_trie.literals()
+
+    def _may_be_reversed(self, phone_number):
+        """
+        checks if phone_number could match the reversed regex (number, separator, prefix).
+        phone_number must contain a non digit
+        """
+        head = phone_number.lstrip(DIGITS)
+        separators = head.rstrip(DIGITS)
+        prefix = head[len(separators):]
+
+        if len(head) == len(phone_number) or not prefix or len(separators) > 2:
+            return False
+        if NON_REVERSING_SEPARATORS.intersection(separators):
+            return False
+        return prefix in self._reversed_prefixes
 
 
     def _get_match_index(self, group_dict):
@@ -116,39 +453,239 @@ class CountryCanonizer(object):
         """
         return map(self.canonize, phone_numbers)
 
+    def cache_info(self):
+        """
+        :return: dict of canonize() cache statistics (hits, misses, evictions, size, max_size), or None without cache
+        """
+        if self._cache is None:
+            return None
+        return self._cache.info()
+
+    def enable_instrumentation(self, callback=None):
+        """
+        Starts counting and timing the stages of the pipeline (see instrumentation_snapshot). counters start at 0.
+        Nothing is counted while disabled, and the pipeline runs without any extra call.
+        canonize() results served by the cache are not counted
+        :param callback: optional function, called with an instrumentation.CanonizationEvent after every
+        canonization
+        """
+        self.disable_instrumentation()
+        self._stats = instrumentation.PipelineStats(self._regexes_names, self.OUTCOME_NAMES)
+        self._instrumentation_callback = callback
+        self._plain_regexes_lst = self._regexes_lst
+        self._regexes_lst = [(instrumentation.TimedRegex(regex, name, self._stats), replace, is_canonizing)
+                             for name, (regex, replace, is_canonizing) in zip(self._regexes_names, self._regexes_lst)]
+
+        # instance attributes hide the plain methods, so the pipeline itself is untouched
+        self._canonize_parts = self._instrumented_canonize_parts
+        self._canonize_fast = self._instrumented_canonize_fast
+        self._try_extract_parts = self._instrumented_try_extract_parts
+
+    def disable_instrumentation(self):
+        """
+        Stops counting, and drops the counters
+        """
+        if self._stats is None:
+            return
+        self._regexes_lst = self._plain_regexes_lst
+        for name in ('_canonize_parts', '_canonize_fast', '_try_extract_parts', '_plain_regexes_lst',
+                     '_instrumentation_callback'):
+            delattr(self, name)
+        self._stats = None
+
+    def instrumentation_snapshot(self):
+        """
+        :return: dict of the counters (see instrumentation.PipelineStats.snapshot), or None when disabled
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot()
+
+    def _instrumented_canonize_parts(self, phone_number):
+        stats = self._stats
+        stats.begin()
+        start = instrumentation.clock()
+        base_number, extras, code = CountryCanonizer._canonize_parts(self, phone_number)
+        seconds = instrumentation.clock() - start
+        stats.end(code, seconds)
+        if self._instrumentation_callback is not None:
+            self._instrumentation_callback(instrumentation.CanonizationEvent(
+                phone_number, code, seconds, tuple(stats.current_rules), stats.current_extracted))
+        return base_number, extras, code
+
+    def _instrumented_canonize_fast(self, phone_number):
+        start = instrumentation.clock()
+        canonized = CountryCanonizer._canonize_fast(self, phone_number)
+        self._stats.add_fast_path(canonized is not None, instrumentation.clock() - start)
+        return canonized
+
+    def _instrumented_try_extract_parts(self, phone_number):
+        start = instrumentation.clock()
+        result = CountryCanonizer._try_extract_parts(self, phone_number)
+        self._stats.add_extract(instrumentation.clock() - start)
+        return result
+
     def canonize(self, phone_number):
         """
         canonize a phone number (country_code+prefix+digits)
         """
 
+        if self._cache is None or phone_number is None:
+            return self._canonize(phone_number)
+
+        canonized = self._cache.get(phone_number, _MISSING)
+        if canonized is _MISSING:
+            canonized = self._canonize(phone_number)
+            if canonized is not None:
+                # cached results are shared between callers
+                canonized = frozenset(canonized)
+            self._cache.put(phone_number, canonized)
+        return canonized
+
+    def canonize_with_code(self, phone_number):
+        """
+        canonize a phone number, and tell how (without cache)
+        :rtype: tuple
+        :return: canonization result (as in canonize), code (SIMPLE_CANON, EXTRACTED or NOTHING)
+        """
+        base_number, extras, code = self._canonize_parts(phone_number)
+        if base_number is None:
+            return None, code
+        if extras:
+            return self._extract_phones(base_number, extras), code
+        return {base_number}, code
+
+    def canonize_ranges(self, phone_number):
+        """
+        canonize a phone number into ranges, without building its numbers (without cache)
+        :rtype: tuple
+        :return: sorted list of disjoint NumberRange covering the canonization result (None if phone_number
+        can't be trimmed), code (as in canonize_with_code)
+        """
+        base_number, extras, code = self._canonize_parts(phone_number)
+        if base_number is None:
+            return None, code
+
+        ranges = [NumberRange(base_number, base_number)]
+        for extra in extras:
+            if isinstance(extra, NumberRange):
+                ranges.append(extra)
+            else:
+                new_num = base_number[:-len(extra)] + extra
+                ranges.append(NumberRange(new_num, new_num))
+        return _union_ranges(ranges), code
+
+    def count_canonized(self, phone_number):
+        """
+        :return: amount of numbers canonize() returns for phone_number (0 for None), without building them
+        """
+        ranges, code = self.canonize_ranges(phone_number)
+        if ranges is None:
+            return 0
+        return sum(number_range.size() for number_range in ranges)
+
+    def canonizemany_compact(self, phone_numbers, compact=None):
+        """
+        canonize many phone numbers into a CompactCanonized, instead of a set per number (without cache)
+        :param compact: CompactCanonized to add the rows to, defaults to a new one
+        :return: CompactCanonized, row i is the result of phone_numbers[i]
+        """
+        if compact is None:
+            compact = CompactCanonized()
+
+        for phone_number in phone_numbers:
+            base_number, extras, code = self._canonize_parts(phone_number)
+            if base_number is None:
+                compact.append((), code)
+            else:
+                numbers = [base_number]
+                numbers.extend(self._iter_extracted(base_number, extras))
+                compact.append(numbers, code)
+        return compact
+
+    def canonize_column(self, phone_numbers):
+        """
+        Canonizes a whole column at once, without building a set per row.
+        Rows that are not strings (None, NaN) are treated as missing.
+        :param phone_numbers: numpy array or any sequence of phone numbers
+        :return: CanonizedColumn of parallel arrays:
+            primary: canonized phone of every row (None for missing rows)
+            codes: outcome code of every row (SIMPLE_CANON, EXTRACTED or NOTHING)
+            offsets: alternatives of row i are alternatives[offsets[i]:offsets[i + 1]]
+            alternatives: flat array of the extracted phones that are not the primary one
+        numpy arrays are returned when numpy is installed and phone_numbers is a numpy array
+        """
+
+        # a numpy array can only exist once numpy was imported, so importing it here would only slow startup
+        numpy = sys.modules.get('numpy')
+        is_numpy = numpy is not None and isinstance(phone_numbers, numpy.ndarray)
+        if is_numpy:
+            phone_numbers = phone_numbers.tolist()
+
+        primary = []
+        codes = array.array('b')
+        offsets = array.array(OFFSET_TYPECODE, [0])
+        alternatives = []
+        canonize_parts = self._canonize_parts
+        nothing = self.NOTHING
+
+        for phone_number in phone_numbers:
+            if isinstance(phone_number, basestring):
+                base_number, extras, code = canonize_parts(phone_number)
+            else:
+                base_number, extras, code = None, (), nothing
+            primary.append(base_number)
+            codes.append(code)
+            if extras:
+                alternatives.extend(self._iter_extracted(base_number, extras))
+            offsets.append(len(alternatives))
+
+        if is_numpy:
+            return CanonizedColumn(numpy.array(primary, dtype=object), numpy.array(codes, dtype=numpy.int8),
+                                   numpy.array(offsets, dtype=numpy.int64), numpy.array(alternatives, dtype=object))
+        return CanonizedColumn(primary, codes, offsets, alternatives)
+
+    def _canonize(self, phone_number):
+        """
+        canonize a phone number, without cache
+        """
+
+        return self.canonize_with_code(phone_number)[0]
+
+    def _canonize_parts(self, phone_number):
+        """
+        canonize a phone number, without building a set
+        :rtype: tuple
+        :return: base_number (None if phone_number can't be trimmed), alternative endings, code
+        """
+
         if phone_number is None:
-            return None
+            return None, (), self.NOTHING
 
         # Remove '+' and '0' from beginning and non-numbers from end
         trimmed_match = self._regexes_dict['trimmer'][0].search(phone_number)
         if trimmed_match:
             phone_number = trimmed_match.group('phone')
         else:
-            return None
+            return None, (), self.NOTHING
 
         simple_canon, success = self._canonize_simple(phone_number)
-        simple_canon = {simple_canon}  # Save it into a set
-        if not success:
-            extracted, success = self._try_extract(phone_number)
-        else:
-            extracted = simple_canon
+        if success:
+            return simple_canon, (), self.SIMPLE_CANON
+        return self._try_extract_parts(phone_number)
 
-        return extracted
-
-    def _try_extract(self, phone_number):
+    def _try_extract_parts(self, phone_number):
         """
         phone_number is already trimmed
-        try extracting multiple phone number ("04754770383/4" will be "04754770383, 04754470384")
         :rtype: tuple
-        :return: extracted_number_set, code (0-simple canonized, 1-extracted, 2-none)
+        :return: base_number (phone_number itself if none found), alternative endings, code
         """
 
-        phone_parts = self._regexes_dict['number_parts'].findall(phone_number)
+        if self.expand_ranges:
+            part_matches = list(self._regexes_dict['number_parts'].finditer(phone_number))
+            phone_parts = [part_match.group() for part_match in part_matches]
+        else:
+            phone_parts = self._regexes_dict['number_parts'].findall(phone_number)
         temp_number = ''
 
         for index, phone_part in enumerate(phone_parts):
@@ -161,16 +698,78 @@ class CountryCanonizer(object):
                     break
         else:
             # no base number found
-            return {phone_number}, self.NOTHING
+            return phone_number, (), self.NOTHING
 
         # From here on, it's based on the fact it found a base number
         if index == len(phone_parts) - 1:
             # No extras
-            return {base_number}, self.SIMPLE_CANON
+            return base_number, (), self.SIMPLE_CANON
 
         extras = phone_parts[index + 1:]
-        extracted_phones = self._extract_phones(base_number, extras)
-        return extracted_phones, self.EXTRACTED
+        if self.expand_ranges:
+            separators = [phone_number[part_matches[part_index].end():part_matches[part_index + 1].start()]
+                          for part_index in xrange(index, len(part_matches) - 1)]
+            extras = self._join_ranges(base_number, extras, separators)
+        return base_number, extras, self.EXTRACTED
+
+    def _join_ranges(self, base_number, extras, separators):
+        """
+        :param extras: alternative endings
+        :param separators: text before every ending
+        :return: alternative endings, where endings joined by RANGE_SEPARATOR are replaced by a NumberRange.
+        the ending before the first one of extras is the end of base_number itself
+        """
+
+        endings = []
+        previous = base_number
+        for extra, separator in itertools.izip(extras, separators):
+            if separator.strip() == RANGE_SEPARATOR:
+                number_range = self._ending_range(base_number, previous, extra)
+                if number_range is not None:
+                    if endings and endings[-1] == previous:
+                        # the range starts with it
+                        endings.pop()
+                    endings.append(number_range)
+                    previous = extra
+                    continue
+            endings.append(extra)
+            previous = extra
+        return endings
+
+    def _ending_range(self, base_number, first, last):
+        """
+        :return: NumberRange of base_number ending with first up to base_number ending with last,
+        or None when it is empty, reversed or bigger than max_expansion
+        """
+
+        first_number = base_number[:-len(first)] + first
+        last_number = base_number[:-len(last)] + last
+        if len(first_number) != len(last_number) or first_number >= last_number:
+            return None
+        number_range = NumberRange(first_number, last_number)
+        if number_range.size() > self.max_expansion:
+            return None
+        return number_range
+
+    def _iter_extracted(self, base_number, extras):
+        """
+        :param base_number: basic phone number
+        :param extras: alternative endings (and NumberRange, see _join_ranges)
+        :return: generator of the distinct phones made of base_number and an alternative ending,
+        other than base_number itself
+        """
+
+        seen = {base_number}
+
+        for extra in extras:
+            if isinstance(extra, NumberRange):
+                new_nums = extra.numbers()
+            else:
+                new_nums = (base_number[:-len(extra)] + extra,)
+            for new_num in new_nums:
+                if new_num not in seen:
+                    seen.add(new_num)
+                    yield new_num
 
     def _extract_phones(self, base_number, extras):
         """
@@ -182,12 +781,7 @@ class CountryCanonizer(object):
         """
 
         all_phones = {base_number}
-
-        for extra in extras:
-            partial_base_num = base_number[:-len(extra)]
-            new_num = partial_base_num + extra
-            all_phones.add(new_num)
-
+        all_phones.update(self._iter_extracted(base_number, extras))
         return all_phones
 
     def _canonize_simple(self, phone_number):
@@ -197,6 +791,52 @@ class CountryCanonizer(object):
         :rtype : tuple (canonized_phone, has_been_canonized)
         """
 
+        if self._format_trie is not None and type(phone_number) is str and '\n' not in phone_number:
+            canonized = self._canonize_fast(phone_number)
+            if canonized is not None:
+                return canonized
+
+        return self._canonize_regexes(phone_number)
+
+    def _canonize_fast(self, phone_number):
+        """
+        regex free version of _canonize_regexes, for byte strings without newlines.
+        :return: same as _canonize_regexes, or None when phone_number might be reversed (prefix at end)
+        """
+
+        # trimmer: leading [\s+0] are removed, but at least one character is kept
+        trimmed = phone_number.lstrip(TRIMMED_CHARS) or phone_number[-1:]
+
+        digits = trimmed.translate(None, NON_DIGITS)
+        if len(digits) != len(trimmed) and self._may_be_reversed(trimmed):
+            return None
+
+        canonize_success = False
+        country_code = self._country_phone.country_code
+
+        # stuck_zeroes: 0* gives back zeroes until the rest matches an alternative
+        if digits.startswith(country_code):
+            national = digits[len(country_code):]
+            stuck_zeroes = len(national) - len(national.lstrip('0'))
+            for zeroes in xrange(stuck_zeroes, -1, -1):
+                if self._format_trie.matches(national[zeroes:]):
+                    digits = country_code + national[zeroes:]
+                    canonize_success = True
+                    break
+
+        # no_country_code
+        if self._format_trie.matches(digits):
+            digits = country_code + digits
+            canonize_success = True
+
+        return digits, canonize_success
+
+    def _canonize_regexes(self, phone_number):
+        """
+        canonize a phone number by passing it through all canonizing regexes.
+        :rtype : tuple (canonized_phone, has_been_canonized)
+        """
+
         canonize_success = False
         for index, regex_repl in enumerate(self._regexes_lst):
             # pass phone number through regexes (trimming, reversing, removing stuck zeroe, adding country code)
@@ -211,27 +851,42 @@ class CountryCanonizer(object):
                     index = self._get_match_index(results)
                     phone_number = regex.sub(replace.format(i=index), phone_number)
                 else:
-                    phone_number = re.sub(regex, replace, phone_number)
+                    phone_number = regex.sub(replace, phone_number)
 
         return phone_number, canonize_success
 
-def create_israeli_canonizer(is_strict=True, is_canonized=True):
+def create_israeli_canonizer(is_strict=True, is_canonized=True, cache_size=None):
     """
     :return: israeli canonizer instance
     """
-    return CountryCanonizer(phone_formats.create_israeli_phone(is_strict=True, is_canonized=True))
+    return CountryCanonizer(phone_formats.create_israeli_phone(is_strict=True, is_canonized=True),
+                            cache_size=cache_size)
 
-def create_belgian_canonizer(is_strict=True, is_canonized=True):
+def create_belgian_canonizer(is_strict=True, is_canonized=True, cache_size=None):
     """
     :return: belgian canonizer instance
     """
-    return CountryCanonizer(phone_formats.create_belgian_phone(is_strict=True, is_canonized=True))
+    return CountryCanonizer(phone_formats.create_belgian_phone(is_strict=True, is_canonized=True),
+                            cache_size=cache_size)
 
-def create_holland_canonizer(is_strict=True, is_canonized=True):
+def create_holland_canonizer(is_strict=True, is_canonized=True, cache_size=None):
     """
     :return: dutch canonizer instance
     """
-    return CountryCanonizer(phone_formats.create_holland_phone(is_strict=True, is_canonized=True))
+    return CountryCanonizer(phone_formats.create_holland_phone(is_strict=True, is_canonized=True),
+                            cache_size=cache_size)
+
+def create_canonizer(country, cache_size=None):
+    """
+    :param country: country name, as in create_all_canonizers
+    :param cache_size: see CountryCanonizer
+    :return: canonizer instance of that country
+    """
+    try:
+        definition = phone_formats.country_definitions()[country]
+    except KeyError:
+        raise ValueError('No canonizer for country {0!r}'.format(country))
+    return CountryCanonizer(phone_formats.create_country_phone(definition), cache_size=cache_size)
 
 def create_all_canonizers(is_strict=True, is_canonized=True):
     """
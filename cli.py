@@ -0,0 +1,328 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# cli.py
+# Canonizes phone columns of big
+# CSV or JSON lines streams, from
+# the shell
+#
+##################################
+
+import sys, csv, json, time, argparse, itertools, collections, multiprocessing, canonization, dispatch, \
+    phone_formats, snapshot, bulk
+
+AUTO = 'auto'
+FORMATS = ('csv', 'jsonl')
+DEFAULT_CHUNK_SIZE = bulk.DEFAULT_CHUNK_SIZE
+OUTPUT_BUFFER_SIZE = 1 << 20
+# Joins the canonized numbers of a csv cell
+CANONIZED_SEPARATOR = ';'
+DEFAULT_PROGRESS_INTERVAL = 5.0
+
+
+def _create_canonize(country, snapshot_path=None):
+    """
+    :param country: country name, or AUTO to find the country of every number (see dispatch.CountryDispatcher)
+    :return: function of a phone number to a tuple of countries (see CountryDispatcher.canonize_with_code),
+    canonization result, code
+    """
+    countries = None if country == AUTO else [country]
+    if snapshot_path is not None:
+        canonizers = snapshot.load_snapshot(snapshot_path, countries=countries)
+    elif country == AUTO:
+        canonizers = canonization.create_all_canonizers()
+    else:
+        canonizers = {country: canonization.create_canonizer(country)}
+
+    if country == AUTO:
+        return dispatch.CountryDispatcher(canonizers).canonize_with_code
+
+    canonize_with_code = canonizers[country].canonize_with_code
+
+    def canonize(phone_number):
+        canonized, code = canonize_with_code(phone_number)
+        return (country,), canonized, code
+    return canonize
+
+
+def _canonize_values(canonize, values):
+    """
+    :param values: list of rows, every row is a list of phone numbers (one per column)
+    :return: list of rows, every row is a list of (countries, canonization result, code)
+    """
+    return [map(canonize, row_values) for row_values in values]
+
+
+def _phone_value(value):
+    """
+    :return: value as a byte string phone number, None when it can't be one
+    """
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, str) or value is None:
+        return value
+    if isinstance(value, (int, long)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+def output_fields(columns, country):
+    """
+    :return: names of the fields StreamCanonizer adds to every row, in order
+    """
+    fields = []
+    for column in columns:
+        fields.extend([column + '_canonized', column + '_code'])
+        if country == AUTO:
+            fields.append(column + '_country')
+    return fields
+
+
+class StreamCanonizer(object):
+    """
+    Canonizes phone columns of a stream of rows (dicts), chunk by chunk, on a pool of processes
+    (see bulk.ChunkPool). Output keeps the order of the input, and only a few chunks per worker are
+    in flight at once, so any stream is canonized with constant memory.
+    Every column adds the fields <column>_canonized (sorted list of numbers, None if nothing was canonized),
+    <column>_code (name of the outcome, see CountryCanonizer.OUTCOME_NAMES) and <column>_country (AUTO only,
+    sorted list of the countries that canonized the number, many when it is ambiguous)
+    """
+
+    def __init__(self, columns, country, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, snapshot_path=None):
+        """
+        :param columns: names of the phone number columns
+        :param country: country name, or AUTO to find the country of every number
+        :param workers: number of processes. 1 canonizes in this process
+        :param chunk_size: amount of rows sent to a worker at once
+        :param snapshot_path: snapshot to load the canonizers from (see snapshot.save_snapshot)
+        """
+        if country != AUTO and country not in phone_formats.country_definitions():
+            raise ValueError('No canonizer for country {0!r}'.format(country))
+
+        self.columns = list(columns)
+        self.country = country
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.snapshot_path = snapshot_path
+        self.rows = 0
+        self.outcomes = collections.Counter()
+        self._chunk_pool = bulk.ChunkPool(_create_canonize, (country, snapshot_path), workers)
+
+    def __repr__(self):
+        return 'StreamCanonizer({0}, country={1}, workers={2})'.format(', '.join(self.columns), self.country,
+                                                                      self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _merge(self, chunk, results):
+        """
+        adds the canonization results to the rows of chunk
+        """
+        is_auto = self.country == AUTO
+        for row, row_results in itertools.izip(chunk, results):
+            for column, (countries, canonized, code) in itertools.izip(self.columns, row_results):
+                code_name = canonization.CountryCanonizer.OUTCOME_NAMES[code]
+                if code == canonization.CountryCanonizer.NOTHING:
+                    # the phone number itself, not a canonized one
+                    canonized = None
+                row[column + '_canonized'] = sorted(canonized) if canonized is not None else None
+                row[column + '_code'] = code_name
+                if is_auto:
+                    row[column + '_country'] = list(countries) or None
+                self.outcomes[code_name] += 1
+        self.rows += len(chunk)
+        return chunk
+
+    def imap_chunks(self, rows):
+        """
+        :param rows: iterable of dicts, consumed lazily
+        :return: generator of lists of the same rows, with the canonization fields added
+        """
+        # rows wait here while their values are canonized
+        row_chunks = collections.deque()
+
+        def iter_values():
+            for chunk in bulk.iter_chunks(rows, self.chunk_size):
+                row_chunks.append(chunk)
+                yield [[_phone_value(row.get(column)) for column in self.columns] for row in chunk]
+
+        for results in self._chunk_pool.imap(_canonize_values, iter_values()):
+            yield self._merge(row_chunks.popleft(), results)
+
+    def close(self):
+        """
+        stops the worker processes
+        """
+        self._chunk_pool.close()
+
+
+class ProgressReporter(object):
+    """
+    Writes the amount of rows done and the throughput to a stream (stderr), at most once per interval
+    """
+
+    def __init__(self, interval=DEFAULT_PROGRESS_INTERVAL, stream=None):
+        self.interval = interval
+        self.stream = sys.stderr if stream is None else stream
+        self._start = time.time()
+        self._last = self._start
+
+    def _write(self, rows, now, outcomes=None):
+        seconds = now - self._start
+        line = '{0} rows in {1:.1f}s, {2:.0f} rows/s'.format(rows, seconds, rows / seconds if seconds else 0)
+        if outcomes:
+            line += ' ({0})'.format(', '.join('{0}: {1}'.format(name, count)
+                                              for name, count in sorted(outcomes.iteritems())))
+        self.stream.write(line + '\n')
+
+    def update(self, rows):
+        now = time.time()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._write(rows, now)
+
+    def finish(self, rows, outcomes=None):
+        """
+        writes the final counts, with the amount of every outcome
+        """
+        self._write(rows, time.time(), outcomes)
+
+
+def _open_input(path):
+    return sys.stdin if path == '-' else open(path, 'rb')
+
+
+def _input_format(path, input_format):
+    """
+    :return: input_format, or the format of the path extension (csv when unknown)
+    """
+    if input_format is not None:
+        return input_format
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return 'jsonl'
+    return 'csv'
+
+
+def iter_jsonl(stream):
+    """
+    :return: generator of the objects of a JSON lines stream (blank lines are skipped)
+    """
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_jsonl(chunks, output):
+    """
+    :param chunks: iterable of lists of rows
+    """
+    for chunk in chunks:
+        output.write(''.join(json.dumps(row, sort_keys=True) + '\n' for row in chunk))
+
+
+def write_csv(chunks, output, fieldnames, added_fields, delimiter=','):
+    """
+    :param chunks: iterable of lists of rows
+    :param added_fields: fields of StreamCanonizer, written after fieldnames. lists are joined by
+    CANONIZED_SEPARATOR
+    """
+    writer = csv.DictWriter(output, fieldnames + added_fields, delimiter=delimiter, extrasaction='ignore')
+    writer.writeheader()
+    for chunk in chunks:
+        for row in chunk:
+            for field in added_fields:
+                if isinstance(row[field], list):
+                    row[field] = CANONIZED_SEPARATOR.join(row[field])
+        writer.writerows(chunk)
+
+
+def _reporting(chunks, stream_canonizer, progress):
+    """
+    passes chunks through, reporting progress after every chunk
+    """
+    for chunk in chunks:
+        yield chunk
+        progress.update(stream_canonizer.rows)
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description='Canonize phone number columns of CSV or JSON lines files. '
+                                                 'Rows are written with <column>_canonized, <column>_code '
+                                                 'and <column>_country (auto only) fields')
+    parser.add_argument('paths', nargs='*', default=['-'], help='input files, - for stdin (default: stdin)')
+    parser.add_argument('-c', '--columns', required=True, help='comma separated names of the phone columns')
+    parser.add_argument('--country', required=True,
+                        help='country of the numbers, or auto to find it for every number. auto writes all the '
+                             'countries that canonize an ambiguous number')
+    parser.add_argument('-f', '--format', choices=FORMATS,
+                        help='input and output format (default: by the extension of the first path, else csv)')
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    parser.add_argument('--delimiter', default=',', help='csv delimiter (default: %(default)r)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='canonizing processes, 0 for the number of cpus (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='rows sent to a worker and written at once (default: %(default)s)')
+    parser.add_argument('--snapshot', help='snapshot to load the canonizers from (see snapshot.py)')
+    parser.add_argument('--progress', type=float, nargs='?', const=DEFAULT_PROGRESS_INTERVAL,
+                        help='report progress to stderr every PROGRESS seconds (default when given: %(const)s)')
+    args = parser.parse_args(argv)
+
+    if args.country != AUTO and args.country not in phone_formats.country_definitions():
+        parser.error('unknown country {0!r}, known: {1}'.format(
+            args.country, ', '.join(sorted(phone_formats.country_definitions()) + [AUTO])))
+    if args.chunk_size <= 0:
+        parser.error('--chunk-size must be positive')
+    if args.workers < 0:
+        parser.error('--workers must not be negative')
+    return args
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    columns = [column.strip() for column in args.columns.split(',') if column.strip()]
+    workers = args.workers or multiprocessing.cpu_count()
+    input_format = _input_format(args.paths[0], args.format)
+    added_fields = output_fields(columns, args.country)
+    progress = ProgressReporter(args.progress) if args.progress is not None else None
+
+    if args.output is None:
+        output = sys.stdout
+    else:
+        output = open(args.output, 'wb', OUTPUT_BUFFER_SIZE)
+    inputs = [_open_input(path) for path in args.paths]
+
+    with StreamCanonizer(columns, args.country, workers, args.chunk_size, args.snapshot) as stream_canonizer:
+        if input_format == 'csv':
+            readers = [csv.DictReader(stream, delimiter=args.delimiter) for stream in inputs]
+            rows = itertools.chain.from_iterable(readers)
+        else:
+            rows = itertools.chain.from_iterable(iter_jsonl(stream) for stream in inputs)
+
+        chunks = stream_canonizer.imap_chunks(rows)
+        if progress is not None:
+            chunks = _reporting(chunks, stream_canonizer, progress)
+
+        if input_format == 'csv':
+            # the first row is read before the header, so the header of the first file is known
+            chunks = iter(chunks)
+            first_chunk = next(chunks, [])
+            fieldnames = readers[0].fieldnames or []
+            write_csv(itertools.chain([first_chunk], chunks), output, fieldnames, added_fields, args.delimiter)
+        else:
+            write_jsonl(chunks, output)
+
+        if progress is not None:
+            progress.finish(stream_canonizer.rows, stream_canonizer.outcomes)
+
+    output.flush()
+    if output is not sys.stdout:
+        output.close()
+
+
+if __name__ == '__main__':
+    main()
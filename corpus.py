@@ -0,0 +1,113 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# corpus.py
+# Generates synthetic phone numbers
+# and texts from the phone formats,
+# for benchmarks
+#
+##################################
+
+import random
+
+DIGITS = '0123456789'
+SEPARATORS = ['', '', '-', ' ', '.', '/']
+WORDS = ['call', 'me', 'at', 'the', 'office', 'number', 'is', 'or', 'tomorrow', 'please', 'contact', 'our', 'support',
+         'team', 'for', 'more', 'details', 'about', 'your', 'order', 'phone', 'fax', 'ext', 'thanks', 'regards']
+
+
+def _random_digits(rng, count):
+    return ''.join(rng.choice(DIGITS) for _ in xrange(count))
+
+
+class PhoneCorpus(object):
+    """
+    Generates phone numbers of a single country, out of its PhoneFormat definitions.
+    Generation is reproducible for a given seed
+    """
+
+    def __init__(self, country_phone, seed=0):
+        self._country_phone = country_phone
+        self._rng = random.Random(seed)
+        self._formats = []
+        for phone_format in country_phone.get_phone_formats():
+            literals = phone_format.prefix_literals()
+            if literals:
+                self._formats.append((sorted(literals), phone_format))
+        if not self._formats:
+            raise ValueError('{0} has no format that can be generated'.format(country_phone))
+
+    def national(self):
+        """
+        :return: tuple of (prefix, number) of a valid national number, without trunk zero or country code
+        """
+        literals, phone_format = self._rng.choice(self._formats)
+        length = self._rng.randint(phone_format.min_length, phone_format.max_length)
+        return self._rng.choice(literals), _random_digits(self._rng, length)
+
+    def valid(self):
+        """
+        :return: valid phone number, written in one of the common ways (country code, trunk zero, separators)
+        """
+        prefix, number = self.national()
+        separator = self._rng.choice(SEPARATORS)
+        style = self._rng.randint(0, 3)
+        if style == 0:
+            return '0' + prefix + separator + number
+        if style == 1:
+            return '+' + self._country_phone.country_code + separator + prefix + separator + number
+        if style == 2:
+            return '00' + self._country_phone.country_code + separator + '0' + prefix + separator + number
+        return self._country_phone.country_code + prefix + number
+
+    def near_miss(self):
+        """
+        :return: number that looks valid, but has a digit too many or too few
+        """
+        prefix, number = self.national()
+        if self._rng.random() < 0.5:
+            number = number[:-1]
+        else:
+            number += self._rng.choice(DIGITS)
+        return '0' + prefix + self._rng.choice(SEPARATORS) + number
+
+    def extension_suffixed(self, extensions=2):
+        """
+        :return: valid number followed by alternative endings, like 052-8197720/21/22
+        """
+        number = self.valid()
+        suffixes = [_random_digits(self._rng, 2) for _ in xrange(extensions)]
+        return '/'.join([number] + suffixes)
+
+    def reversed_prefix(self):
+        """
+        :return: number written before its prefix, like 8197720-052
+        """
+        prefix, number = self.national()
+        return number + self._rng.choice(['-', ' - ', '/']) + '0' + prefix
+
+    def numbers(self, count, kind='valid'):
+        """
+        :param kind: name of a generating method (valid, near_miss, extension_suffixed, reversed_prefix)
+        :return: list of count numbers
+        """
+        generate = getattr(self, kind)
+        return [generate() for _ in xrange(count)]
+
+    def prose(self, words, phone_density=0.01):
+        """
+        :param words: amount of words in the text
+        :param phone_density: probability of every word to be a valid phone number
+        :return: text of words, with some phone numbers
+        """
+        parts = []
+        for _ in xrange(words):
+            if self._rng.random() < phone_density:
+                parts.append(self.valid())
+            else:
+                parts.append(self._rng.choice(WORDS))
+        return ' '.join(parts)
+
+
+NUMBER_KINDS = ('valid', 'near_miss', 'extension_suffixed', 'reversed_prefix')
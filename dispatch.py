@@ -0,0 +1,173 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# dispatch.py
+# Routes phone numbers of unknown
+# country to the right canonizers
+#
+##################################
+
+import re, canonization
+
+# key of the countries whose code ends at a trie node
+_COUNTRIES = None
+
+# Runs of digits, separated by anything else
+_DIGIT_RUNS = re.compile(r'\d+')
+
+
+class CountryDispatcher(object):
+    """
+    Finds the candidate countries of a phone number of unknown origin, instead of trying every canonizer.
+    Country codes are kept in a digit trie, so routing costs the same for any amount of countries.
+    Numbers without a known country code are routed to the countries whose lengths fit
+    """
+
+    def __init__(self, canonizers=None):
+        """
+        :param canonizers: dict of country name to CountryCanonizer, defaults to create_all_canonizers()
+        """
+        if canonizers is None:
+            canonizers = canonization.create_all_canonizers()
+
+        self._canonizers = canonizers
+        self._root = {}
+        self._national_lengths = []
+
+        for country in sorted(canonizers):
+            country_phone = canonizers[country]._country_phone
+            node = self._root
+            for digit in country_phone.country_code:
+                node = node.setdefault(digit, {})
+            node.setdefault(_COUNTRIES, []).append(country)
+
+            min_length, max_length = self._national_length_bounds(country_phone)
+            self._national_lengths.append((country, min_length, max_length))
+
+    def __repr__(self):
+        return 'CountryDispatcher({0})'.format(', '.join(sorted(self._canonizers)))
+
+    @staticmethod
+    def _national_length_bounds(country_phone):
+        """
+        :return: tuple of min and max amount of digits of a national number (prefix included).
+        max is None when a prefix can't be expanded
+        """
+        min_lengths = []
+        max_lengths = []
+        for phone_format in country_phone.get_phone_formats():
+            literals = phone_format.prefix_literals()
+            if literals is None:
+                min_lengths.append(phone_format.min_length)
+                max_lengths.append(None)
+                continue
+            prefix_lengths = [len(literal) for literal in literals] or [0]
+            min_lengths.append(min(prefix_lengths) + phone_format.min_length)
+            max_lengths.append(max(prefix_lengths) + phone_format.max_length)
+
+        if None in max_lengths:
+            return min(min_lengths), None
+        return min(min_lengths), max(max_lengths)
+
+    def candidates(self, phone_number):
+        """
+        :return: list of candidate country names, most probable first:
+        countries whose code starts the number (longest code first), then countries whose lengths fit
+        """
+        by_code, by_length = self._split_candidates(phone_number)
+        return by_code + by_length
+
+    def _split_candidates(self, phone_number):
+        """
+        :return: tuple of the countries whose code starts the number (longest code first),
+        and the other countries whose lengths fit
+        """
+        trimmed = phone_number.lstrip(canonization.TRIMMED_CHARS)
+        if isinstance(trimmed, unicode):
+            digits = ''.join(char for char in trimmed if char in canonization.DIGITS)
+        else:
+            digits = trimmed.translate(None, canonization.NON_DIGITS)
+
+        # the canonizers trim the zeroes left after a non digit start too, like (00972) 52-8197720
+        by_code = []
+        node = self._root
+        for digit in digits.lstrip('0'):
+            node = node.get(digit)
+            if node is None:
+                break
+            by_code[:0] = node.get(_COUNTRIES, ())
+
+        # The base number is made of the first digit runs, the runs after it may be extensions
+        # (052-8197720/21 is 052 8197720 and an extension). Like in CountryCanonizer._try_extract_parts,
+        # the trunk zero of the joined runs is trimmed, so (052) 8197720 is 9 digits long
+        digit_runs = _DIGIT_RUNS.findall(trimmed)
+        base_lengths = {len(digits)}
+        base_number = ''
+        for digit_run in digit_runs:
+            base_number += digit_run
+            base_lengths.add(len(base_number.lstrip('0')))
+        if len(digit_runs) == 2:
+            # reversed (8197720-052), the zeroes that end the number may be dropped (see _create_orred_reversed_regexes)
+            number, prefix = digit_runs
+            base_lengths.update(length + len(prefix) for length in xrange(len(number.rstrip('0')), len(number)))
+        by_length = [country for country, min_length, max_length in self._national_lengths
+                     if country not in by_code and
+                     any(min_length <= length and (max_length is None or length <= max_length)
+                         for length in base_lengths)]
+
+        return by_code, by_length
+
+    def canonize_all_with_code(self, phone_number):
+        """
+        canonize a phone number of unknown country with its candidate canonizers.
+        The first country whose code starts the number and that canonizes it is the only result, else every
+        country whose lengths fit and that canonizes it is a result (03-6293577 is both Belgian and Israeli)
+        :rtype: list
+        :return: list of tuples of country, canonization result, code (as in CountryCanonizer.canonize_with_code),
+        empty if no canonizer succeeded
+        """
+        if phone_number is None:
+            return []
+
+        by_code, by_length = self._split_candidates(phone_number)
+        for country in by_code:
+            canonized, code = self._canonizers[country].canonize_with_code(phone_number)
+            if code != canonization.CountryCanonizer.NOTHING:
+                return [(country, canonized, code)]
+
+        results = []
+        for country in by_length:
+            canonized, code = self._canonizers[country].canonize_with_code(phone_number)
+            if code != canonization.CountryCanonizer.NOTHING:
+                results.append((country, canonized, code))
+        return results
+
+    def canonize_with_code(self, phone_number):
+        """
+        canonize a phone number of unknown country, with all the results of canonize_all_with_code
+        :rtype: tuple
+        :return: tuple of the countries that canonized it (empty if none did, many if it is ambiguous),
+        canonization result (None if no canonizer succeeded, the numbers of all countries if many did),
+        code (the best one of the countries)
+        """
+        results = self.canonize_all_with_code(phone_number)
+        if not results:
+            return (), None, canonization.CountryCanonizer.NOTHING
+        if len(results) == 1:
+            country, canonized, code = results[0]
+            return (country,), canonized, code
+
+        all_canonized = set()
+        for country, canonized, code in results:
+            all_canonized.update(canonized)
+        return tuple(result[0] for result in results), all_canonized, min(result[2] for result in results)
+
+    def canonize(self, phone_number):
+        """
+        :rtype: tuple
+        :return: tuple of the countries that canonized it (empty if none did),
+        canonization result (None if no canonizer succeeded)
+        """
+        countries, canonized, code = self.canonize_with_code(phone_number)
+        return countries, canonized
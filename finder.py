@@ -0,0 +1,176 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# finder.py
+# Finds phone numbers of many
+# countries in a single pass
+#
+##################################
+
+import collections, phone_formats, regex_backends
+
+# Phone numbers are never glued to other digits
+START_ANCHOR = '(?<!\\d)'
+END_ANCHOR = '(?!\\d)'
+# stdlib re compiles up to 100 groups (group 0 included). every phone kind has a single group,
+# so this many kinds are or-ed in one regex
+MAX_GROUPS = 99
+# Digit cluster of at least min_digits digits, where every two digits are at most a separator apart
+PREFILTER_PATTERN = '\\d(?:{sep}\\d){{{min_digits},}}'
+
+# Every byte that is not a digit, removed from the phones found by iterspans
+NON_DIGITS = ''.join(chr(i) for i in xrange(256) if not chr(i).isdigit())
+
+FoundPhone = collections.namedtuple('FoundPhone', ['phone', 'country', 'kind', 'start', 'end'])
+# start and end are byte offsets in the scanned buffer, normalized is the digits of the phone
+FoundSpan = collections.namedtuple('FoundSpan', ['start', 'end', 'normalized', 'country', 'kind'])
+
+
+class PhoneFinder(object):
+    """
+    Compiles the find regexes of every given country into one scanner.
+    Scanning a text costs a single pass, no matter how many countries are registered.
+    When two countries match at the same position, the first one (sorted by name) wins, mobile before line.
+    Beyond MAX_GROUPS phone kinds, the alternatives are split over several regexes, whose matches are merged
+    as if they were a single regex.
+    Unless disabled, the regex only runs on digit clusters that are long enough to hold a phone number
+    (see _create_prefilter), which makes texts with few numbers much faster to scan, with the same results.
+    """
+
+    KINDS = ('mobile', 'line')
+
+    def __init__(self, country_phones=None, is_strict=None, is_canonized=None, with_country=True,
+                 optional_country=False, stuck_zero=False, prefilter=True):
+        """
+        :param country_phones: dict of country name to CountryPhone, defaults to create_all_phones()
+        :param prefilter: False runs the regex over the whole text
+        other params are passed to every country, like CountryPhone.to_find_regex
+        """
+        if country_phones is None:
+            country_phones = phone_formats.create_all_phones()
+
+        self._tags = {}  # group name -> (country, kind)
+        alternatives = []
+
+        for country in sorted(country_phones):
+            country_phone = country_phones[country]
+            for kind in self.KINDS:
+                group_name = 'p{0}'.format(len(self._tags))
+                self._tags[group_name] = (country, kind)
+                alternatives.append(country_phone._create_phone_pattern(getattr(country_phone, kind + '_phone'),
+                                                                        group_name,
+                                                                        is_strict=is_strict,
+                                                                        is_canonized=is_canonized,
+                                                                        with_country=with_country,
+                                                                        optional_country=optional_country,
+                                                                        stuck_zero=stuck_zero))
+
+        self.countries = sorted(country_phones)
+        self.options = dict(is_strict=is_strict, is_canonized=is_canonized, with_country=with_country,
+                            optional_country=optional_country, stuck_zero=stuck_zero)
+        self.patterns = ["{start}(?:{alt}){end}".format(start=START_ANCHOR, end=END_ANCHOR,
+                                                       alt='|'.join(alternatives[index:index + MAX_GROUPS]))
+                         for index in xrange(0, len(alternatives), MAX_GROUPS)]
+        self._regexes = [regex_backends.compile(pattern, features=[regex_backends.LAST_GROUP])
+                         for pattern in self.patterns]
+        self._prefilter = self._create_prefilter(country_phones, is_canonized) if prefilter else None
+
+    @staticmethod
+    def _create_prefilter(country_phones, is_canonized):
+        """
+        Every phone number is a run of digits, with at most a separator between two digits, so it is always
+        inside a single digit cluster that has at least as many digits as the shortest format.
+        :return: compiled regex of these clusters, or None when a prefix isn't made of digits only
+        (see PhoneFormat.prefix_literals), and the shortest number can't be known
+        """
+        min_digits = None
+        has_separators = False
+        for country_phone in country_phones.itervalues():
+            if not phone_formats._stronger_value(country_phone._is_canonized, is_canonized):
+                has_separators = True
+            for phone_format in country_phone.get_phone_formats():
+                literals = phone_format.prefix_literals()
+                if literals is None:
+                    return None
+                if not literals:
+                    continue
+                format_digits = min(len(literal) for literal in literals) + phone_format.min_length
+                min_digits = format_digits if min_digits is None else min(min_digits, format_digits)
+
+        if not min_digits:
+            return None
+        separator = phone_formats.GENERAL_SEPARATOR if has_separators else ''
+        return regex_backends.compile(PREFILTER_PATTERN.format(sep=separator, min_digits=min_digits - 1))
+
+    def __repr__(self):
+        return 'PhoneFinder({0})'.format(', '.join(self.countries))
+
+    def _iter_matches(self, text, pos, endpos):
+        """
+        :return: iterator of the matches of the regexes, like finditer of a single regex of all alternatives:
+        the leftmost match wins, and the first regex of the ones that match at the same position
+        """
+        regexes = self._regexes
+        if len(regexes) == 1:
+            return regexes[0].finditer(text, pos, endpos)
+        return self._iter_merged_matches(text, pos, endpos)
+
+    def _iter_merged_matches(self, text, pos, endpos):
+        regexes = self._regexes
+        matches = [regex.search(text, pos, endpos) for regex in regexes]
+        while True:
+            first = None
+            for match in matches:
+                if match is not None and (first is None or match.start() < first.start()):
+                    first = match
+            if first is None:
+                return
+            yield first
+
+            # phones are never empty, so the search goes on after the match, like finditer
+            pos = first.end()
+            for index, match in enumerate(matches):
+                if match is not None and match.start() < pos:
+                    matches[index] = regexes[index].search(text, pos, endpos)
+
+    def finditer(self, text, pos=0, endpos=None):
+        """
+        :param text: text to look for phone numbers in
+        :return: generator of FoundPhone, by order of appearance
+        """
+        if endpos is None:
+            endpos = len(text)
+
+        if self._prefilter is None:
+            windows = [(pos, endpos)]
+        else:
+            windows = (cluster.span() for cluster in self._prefilter.finditer(text, pos, endpos))
+
+        tags = self._tags
+        for window_start, window_end in windows:
+            for match in self._iter_matches(text, window_start, window_end):
+                group_name = match.lastgroup
+                country, kind = tags[group_name]
+                yield FoundPhone(match.group(group_name), country, kind, match.start(group_name),
+                                 match.end(group_name))
+
+    def iterspans(self, buf, pos=0, endpos=None):
+        """
+        Finds phone numbers in a byte buffer (str, bytearray, buffer or mmap) without decoding it,
+        and without copying more than the phone numbers themselves.
+        memoryview is not accepted by re on python 2, so it is copied once
+        :return: generator of FoundSpan, by order of appearance
+        """
+        if isinstance(buf, memoryview):
+            buf = buf.tobytes()
+
+        for found in self.finditer(buf, pos, endpos):
+            yield FoundSpan(found.start, found.end, str(found.phone).translate(None, NON_DIGITS), found.country,
+                            found.kind)
+
+    def findall(self, text):
+        """
+        :return: list of FoundPhone found in text
+        """
+        return list(self.finditer(text))
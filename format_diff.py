@@ -0,0 +1,182 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# format_diff.py
+# Finds what changed between two
+# versions of the formats of a
+# country
+#
+##################################
+
+import sys, json, argparse, collections, phone_formats, canonization
+
+# A prefix literal whose formats changed. old and new are sorted tuples of (kind, min_length, max_length)
+LiteralChange = collections.namedtuple('LiteralChange', ['literal', 'old', 'new'])
+
+
+def _literal_lengths(country_phone):
+    """
+    :return: dict of prefix literal to the set of (kind, min_length, max_length) of its formats,
+    or None when a prefix can't be expanded to literals
+    """
+    lengths = collections.defaultdict(set)
+    for kind, phone in (('mobile', country_phone.mobile_phone), ('line', country_phone.line_phone)):
+        for phone_format in phone.formats:
+            literals = phone_format.prefix_literals()
+            if literals is None:
+                return None
+            for literal in literals:
+                lengths[literal].add((kind, phone_format.min_length, phone_format.max_length))
+    return lengths
+
+
+class FormatDiff(object):
+    """
+    Difference between two versions of the formats of a country, as the prefix literals whose formats changed.
+    Canonization never splits the digits of a prefix, so a phone number can only be canonized differently
+    if its digits contain a changed literal.
+    A full diff (the country code or a flag changed, or a prefix can't be expanded) may affect any number
+    """
+
+    def __init__(self, country, old_fingerprint, new_fingerprint, changes=(), full_reason=None):
+        """
+        :param changes: list of LiteralChange
+        :param full_reason: why every number may be affected, None if only the changes can
+        """
+        self.country = country
+        self.old_fingerprint = old_fingerprint
+        self.new_fingerprint = new_fingerprint
+        self.changes = list(changes)
+        self.full_reason = full_reason
+
+    def __repr__(self):
+        if self.full_reason is not None:
+            return 'FormatDiff({0}, full: {1})'.format(self.country, self.full_reason)
+        return 'FormatDiff({0}, {1})'.format(self.country, ', '.join(self.literals()))
+
+    def is_full(self):
+        return self.full_reason is not None
+
+    def is_empty(self):
+        """
+        :return: True if no phone number can be canonized differently
+        """
+        return not self.changes and self.full_reason is None
+
+    def literals(self):
+        """
+        :return: sorted list of the changed prefix literals
+        """
+        return [change.literal for change in self.changes]
+
+    def search_literals(self):
+        """
+        :return: sorted list of the changed literals that don't contain another one.
+        digits containing a changed literal contain one of these
+        """
+        literals = sorted(self.literals(), key=len)
+        minimal = []
+        for literal in literals:
+            if not any(shorter in literal for shorter in minimal):
+                minimal.append(literal)
+        return sorted(minimal)
+
+    def could_affect(self, phone_number):
+        """
+        :return: True if phone_number may be canonized differently by the new formats
+        """
+        if self.full_reason is not None:
+            return True
+        digits = canonization.only_digits(phone_number)
+        return any(literal in digits for literal in self.search_literals())
+
+    def to_dict(self):
+        """
+        :return: json serializable dict of the diff
+        """
+        return {'country': self.country, 'old_fingerprint': self.old_fingerprint,
+                'new_fingerprint': self.new_fingerprint, 'full_reason': self.full_reason,
+                'changes': [{'literal': change.literal, 'old': change.old, 'new': change.new}
+                            for change in self.changes]}
+
+
+def diff_country_phones(old_phone, new_phone):
+    """
+    :param old_phone: CountryPhone of the old formats
+    :param new_phone: CountryPhone of the new formats, of the same country
+    :return: FormatDiff of the old formats to the new ones
+    """
+    old_fingerprint = old_phone.fingerprint()
+    new_fingerprint = new_phone.fingerprint()
+    diff = FormatDiff(new_phone.country, old_fingerprint, new_fingerprint)
+    if old_fingerprint == new_fingerprint:
+        return diff
+
+    if old_phone.country_code != new_phone.country_code:
+        diff.full_reason = 'country code changed from {0} to {1}'.format(old_phone.country_code,
+                                                                          new_phone.country_code)
+        return diff
+    old_flags = (old_phone._is_strict, old_phone._is_canonized)
+    if old_flags != (new_phone._is_strict, new_phone._is_canonized):
+        diff.full_reason = 'flags changed'
+        return diff
+
+    old_lengths = _literal_lengths(old_phone)
+    new_lengths = _literal_lengths(new_phone)
+    if old_lengths is None or new_lengths is None:
+        diff.full_reason = "a prefix can't be expanded to literals"
+        return diff
+
+    for literal in sorted(set(old_lengths) | set(new_lengths)):
+        old = tuple(sorted(old_lengths.get(literal, ())))
+        new = tuple(sorted(new_lengths.get(literal, ())))
+        if old != new:
+            diff.changes.append(LiteralChange(literal, old, new))
+    return diff
+
+
+def diff_definitions(old_definition, new_definition):
+    """
+    :param old_definition: country definition (see phone_formats.load_country_definitions)
+    :return: FormatDiff of the old definition to the new one
+    """
+    return diff_country_phones(phone_formats.create_country_phone(old_definition),
+                               phone_formats.create_country_phone(new_definition))
+
+
+def diff_definition_files(old_path, new_path):
+    """
+    :return: dict of country name to FormatDiff, of all countries of both files.
+    countries that were added or removed have a full diff
+    """
+    old_definitions = phone_formats.load_country_definitions(old_path)
+    new_definitions = phone_formats.load_country_definitions(new_path)
+
+    diffs = {}
+    for country in sorted(set(old_definitions) | set(new_definitions)):
+        if country not in new_definitions:
+            diffs[country] = FormatDiff(country, None, None, full_reason='country removed')
+        elif country not in old_definitions:
+            diffs[country] = FormatDiff(country, None, None, full_reason='country added')
+        else:
+            diffs[country] = diff_definitions(old_definitions[country], new_definitions[country])
+    return diffs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print the format changes between two country definition '
+                                                 'files as JSON lines, one per changed country')
+    parser.add_argument('old_path', help='country definitions file of the old formats')
+    parser.add_argument('new_path', nargs='?', default=phone_formats.COUNTRIES_FILE,
+                        help='country definitions file of the new formats (default: the builtin countries)')
+    parser.add_argument('--all', action='store_true', help='print countries that did not change too')
+    args = parser.parse_args(argv)
+
+    for country, diff in sorted(diff_definition_files(args.old_path, args.new_path).iteritems()):
+        if args.all or not diff.is_empty():
+            sys.stdout.write(json.dumps(diff.to_dict(), sort_keys=True) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# format_trie.py
+# Compiles phone formats into a
+# digit trie, for matching digit
+# strings without regexes
+#
+##################################
+
+import collections
+
+DIGITS = '0123456789'
+
+# key of the formats ending at a trie node
+_FORMATS = None
+
+FormatMatch = collections.namedtuple('FormatMatch', ['phone', 'phone_format'])
+
+
+def _by_order(order_and_match):
+    return order_and_match[0]
+
+
+class FormatTrie(object):
+    """
+    Digit trie of the prefix literals of phone formats.
+    Every node where a prefix ends keeps the length ranges allowed after that prefix and the matching formats,
+    so matching a digit string is a single walk over its prefix, without backtracking
+    """
+
+    def __init__(self, tagged_formats, format_literals=None):
+        """
+        :param tagged_formats: iterable of (phone, phone_format) pairs, by priority.
+        phone is any tag returned with a match (usually the Phone instance owning the format)
+        :param format_literals: optional list of the prefix literals of every format, in the same order
+        (see format_literals()). saves expanding the prefixes again
+        :raise ValueError: when a prefix can't be expanded to literals (see PhoneFormat.prefix_literals)
+        """
+        self._root = {}
+        self.max_prefix_length = 0
+        self._literals = set()
+        self._format_literals = []
+
+        for order, (phone, phone_format) in enumerate(tagged_formats):
+            if format_literals is None:
+                literals = phone_format.prefix_literals()
+            else:
+                literals = frozenset(format_literals[order])
+            if literals is None:
+                raise ValueError('Prefix {0!r} can not be compiled to a trie'.format(phone_format.prefix))
+
+            self._format_literals.append(sorted(literals))
+            format_match = FormatMatch(phone, phone_format)
+            for literal in literals:
+                node = self._root
+                for digit in literal:
+                    node = node.setdefault(digit, {})
+                node.setdefault(_FORMATS, []).append((order, phone_format.min_length, phone_format.max_length,
+                                                      format_match))
+                self.max_prefix_length = max(self.max_prefix_length, len(literal))
+                self._literals.add(literal)
+
+        self._literals = frozenset(self._literals)
+
+    @classmethod
+    def from_country(cls, country_phone, format_literals=None):
+        """
+        :return: trie of all formats of a CountryPhone. line formats have priority over mobile ones,
+        like CountryPhone.is_valid
+        """
+        tagged_formats = [(country_phone.line_phone, phone_format) for phone_format in country_phone.line_phone.formats]
+        tagged_formats.extend((country_phone.mobile_phone, phone_format)
+                              for phone_format in country_phone.mobile_phone.formats)
+        return cls(tagged_formats, format_literals)
+
+    def literals(self):
+        """
+        :return: frozenset of all prefix literals
+        """
+        return self._literals
+
+    def format_literals(self):
+        """
+        :return: list of the sorted prefix literals of every format, by priority
+        """
+        return self._format_literals
+
+    def _walk(self, digits):
+        """
+        walks digits down the trie
+        :return: generator of (order, format_match) of every format matching digits, each node by priority
+        """
+        node = self._root
+        length = len(digits)
+
+        for index in xrange(min(length, self.max_prefix_length) + 1):
+            for order, min_length, max_length, format_match in node.get(_FORMATS, ()):
+                if min_length <= length - index <= max_length:
+                    yield order, format_match
+            if index == length:
+                break
+            node = node.get(digits[index])
+            if node is None:
+                break
+
+    def matches(self, digits):
+        """
+        regex free equivalent of matching digits against ^(alternatives)$
+        :param digits: string of digits only
+        """
+        node = self._root
+        length = len(digits)
+
+        for index in xrange(min(length, self.max_prefix_length) + 1):
+            formats = node.get(_FORMATS)
+            if formats is not None:
+                for order, min_length, max_length, format_match in formats:
+                    if min_length <= length - index <= max_length:
+                        return True
+            if index == length:
+                break
+            node = node.get(digits[index])
+            if node is None:
+                break
+
+        return False
+
+    def match(self, digits):
+        """
+        :param digits: string of digits only
+        :return: FormatMatch of the first format (by priority) matching digits, or None
+        """
+        best = None
+        for order, format_match in self._walk(digits):
+            if best is None or order < best[0]:
+                best = order, format_match
+        if best is None:
+            return None
+        return best[1]
+
+    def iter_number_matches(self, phone_number, country_code=''):
+        """
+        every way phone_number matches (see match_number), in the order the exact regex tries them:
+        most leading zeroes first, with the country code before without it, then by priority
+        :return: generator of FormatMatch
+        """
+        if phone_number.endswith('\n'):
+            phone_number = phone_number[:-1]
+        if not phone_number or phone_number.lstrip(DIGITS):
+            return
+
+        leading_zeroes = len(phone_number) - len(phone_number.lstrip('0'))
+        for zeroes in xrange(leading_zeroes, -1, -1):
+            national = phone_number[zeroes:]
+            if country_code and national.startswith(country_code):
+                for order, format_match in sorted(self._walk(national[len(country_code):]), key=_by_order):
+                    yield format_match
+            for order, format_match in sorted(self._walk(national), key=_by_order):
+                yield format_match
+
+    def match_number(self, phone_number, country_code=''):
+        """
+        regex free equivalent of FormatList.to_exact_regex(country_code=country_code) (canonized):
+        leading zeroes, then an optional country code, then one of the formats
+        :return: FormatMatch, or None if phone_number doesn't match
+        """
+        if phone_number.endswith('\n'):
+            # $ matches before a trailing newline
+            phone_number = phone_number[:-1]
+        if not phone_number or phone_number.lstrip(DIGITS):
+            return None
+
+        # 0* is greedy, and gives back zeroes until the rest matches
+        leading_zeroes = len(phone_number) - len(phone_number.lstrip('0'))
+        for zeroes in xrange(leading_zeroes, -1, -1):
+            national = phone_number[zeroes:]
+            if country_code and national.startswith(country_code):
+                format_match = self.match(national[len(country_code):])
+                if format_match is not None:
+                    return format_match
+            format_match = self.match(national)
+            if format_match is not None:
+                return format_match
+
+        return None
@@ -0,0 +1,347 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# index.py
+# On disk index of canonized
+# phone numbers, for joins and
+# dedup without re-canonizing
+#
+##################################
+
+import json, sqlite3, itertools, collections, phone_formats, canonization, format_diff, bulk
+
+INDEX_VERSION = 2
+DEFAULT_CHUNK_SIZE = 1000
+# Bound parameters of a single query (sqlite allows 999 by default)
+MAX_QUERY_PARAMETERS = 500
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    entry_id INTEGER PRIMARY KEY,
+    record_id NOT NULL,
+    raw TEXT NOT NULL,
+    digits TEXT NOT NULL,
+    code INTEGER NOT NULL,
+    UNIQUE (record_id, raw)
+);
+CREATE TABLE IF NOT EXISTS numbers (
+    canonized TEXT NOT NULL,
+    entry_id INTEGER NOT NULL REFERENCES entries (entry_id),
+    PRIMARY KEY (canonized, entry_id)
+);
+CREATE INDEX IF NOT EXISTS numbers_entry ON numbers (entry_id);
+'''
+
+
+class CanonizedIndex(object):
+    """
+    Index of the canonized phone numbers of a single country to the ids of the records they came from,
+    kept in a SQLite file. Records are canonized once, when they are added: joins and duplicate queries
+    are lookups afterwards.
+    Every added (record id, raw phone number) pair is kept with its canonization code, so adding the same
+    pair again does nothing. Text comes back as utf-8 byte strings.
+    When the formats of the country change, recanonize() updates only the entries the change may affect
+    """
+
+    def __init__(self, path, canonizer, chunk_size=DEFAULT_CHUNK_SIZE, allow_changed_formats=False):
+        """
+        :param path: SQLite file, created if missing (':memory:' for an index that is not kept)
+        :param canonizer: CountryCanonizer of the numbers
+        :param chunk_size: amount of records written in a single transaction
+        :param allow_changed_formats: open an index built with other formats of the country.
+        its numbers are stale until recanonize() is called
+        :raise ValueError: when the file is an index of another country, or of other formats of the country
+        (unless allow_changed_formats is set)
+        """
+        self.path = path
+        self.canonizer = canonizer
+        self.chunk_size = chunk_size
+        self.allow_changed_formats = allow_changed_formats
+        self._connection = sqlite3.connect(path)
+        self._connection.text_factory = str
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+            self._check_meta()
+
+    def __repr__(self):
+        return 'CanonizedIndex({0}, {1})'.format(self.path, self.country)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """
+        :return: amount of (record id, raw phone number) entries
+        """
+        return self._connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    @property
+    def country(self):
+        return self.canonizer._country_phone.country
+
+    def _formats_meta(self):
+        """
+        :return: meta entries of the formats of the canonizer
+        """
+        country_phone = self.canonizer._country_phone
+        return {'fingerprint': country_phone.fingerprint(),
+                'definition': json.dumps(country_phone.to_definition(), sort_keys=True)}
+
+    def _check_meta(self):
+        """
+        stamps a new index with its country and formats, or checks those of an existing index
+        """
+        expected = {'version': str(INDEX_VERSION), 'country': self.country}
+        expected.update(self._formats_meta())
+        meta = self.meta()
+        if not meta:
+            self._connection.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', expected.iteritems())
+            return
+
+        if meta.get('version') != expected['version']:
+            raise ValueError('{0} is an index of version {1}, expected {2}'.format(
+                self.path, meta.get('version'), INDEX_VERSION))
+        if meta.get('country') != expected['country']:
+            raise ValueError('{0} is an index of {1}, not {2}'.format(self.path, meta.get('country'), self.country))
+        if meta.get('fingerprint') != expected['fingerprint'] and not self.allow_changed_formats:
+            raise ValueError('{0} was built with other formats of {1}, open it with allow_changed_formats '
+                             'and recanonize it'.format(self.path, self.country))
+
+    def meta(self):
+        """
+        :return: dict of the index metadata (version, country, fingerprint, definition)
+        """
+        return dict(self._connection.execute('SELECT key, value FROM meta'))
+
+    def is_stale(self):
+        """
+        :return: True if the index was built with other formats than those of the canonizer
+        """
+        return self.meta()['fingerprint'] != self.canonizer._country_phone.fingerprint()
+
+    def format_diff(self):
+        """
+        :return: format_diff.FormatDiff of the formats the index was built with to those of the canonizer
+        """
+        indexed_definition = json.loads(self.meta()['definition'], object_hook=phone_formats._str_values)
+        return format_diff.diff_country_phones(phone_formats.create_country_phone(indexed_definition),
+                                               self.canonizer._country_phone)
+
+    def _add_chunk(self, records):
+        """
+        canonizes and inserts a list of (record_id, phone_number) in a single transaction
+        :return: amount of new entries
+        """
+        added = 0
+        nothing = self.canonizer.NOTHING
+        with self._connection:
+            cursor = self._connection.cursor()
+            numbers = []
+            for record_id, phone_number in records:
+                if phone_number is None:
+                    continue
+                canonized, code = self.canonizer.canonize_with_code(phone_number)
+                cursor.execute('INSERT OR IGNORE INTO entries (record_id, raw, digits, code) VALUES (?, ?, ?, ?)',
+                               (record_id, phone_number, canonization.only_digits(phone_number), code))
+                if cursor.rowcount != 1:
+                    # already indexed
+                    continue
+                added += 1
+                if code != nothing:
+                    entry_id = cursor.lastrowid
+                    numbers.extend((number, entry_id) for number in canonized)
+            cursor.executemany('INSERT OR IGNORE INTO numbers (canonized, entry_id) VALUES (?, ?)', numbers)
+        return added
+
+    def add(self, record_id, phone_number):
+        """
+        :return: True if the entry is new
+        """
+        return self._add_chunk([(record_id, phone_number)]) == 1
+
+    def add_many(self, records):
+        """
+        :param records: iterable of (record_id, phone_number), consumed lazily.
+        records without a phone number (None) are skipped
+        :return: amount of new entries
+        """
+        return sum(self._add_chunk(chunk) for chunk in bulk.iter_chunks(records, self.chunk_size))
+
+    def lookup_canonized(self, canonized_numbers):
+        """
+        :param canonized_numbers: iterable of canonized phone numbers
+        :return: dict of canonized number to the set of its record ids (numbers that are not indexed are missing)
+        """
+        found = collections.defaultdict(set)
+        for chunk in bulk.iter_chunks(set(canonized_numbers), MAX_QUERY_PARAMETERS):
+            query = ('SELECT numbers.canonized, entries.record_id FROM numbers '
+                     'JOIN entries ON entries.entry_id = numbers.entry_id '
+                     'WHERE numbers.canonized IN ({0})'.format(', '.join('?' * len(chunk))))
+            for canonized, record_id in self._connection.execute(query, chunk):
+                found[canonized].add(record_id)
+        return dict(found)
+
+    def lookup_many(self, phone_numbers):
+        """
+        :param phone_numbers: list of raw (not canonized) phone numbers
+        :return: list of the sets of ids of the records sharing a canonized number with every phone number
+        """
+        canonized_lists = []
+        for phone_number in phone_numbers:
+            canonized, code = self.canonizer.canonize_with_code(phone_number)
+            canonized_lists.append(canonized if code != self.canonizer.NOTHING else ())
+
+        found = self.lookup_canonized(itertools.chain.from_iterable(canonized_lists))
+        results = []
+        for canonized in canonized_lists:
+            record_ids = set()
+            for number in canonized:
+                record_ids.update(found.get(number, ()))
+            results.append(record_ids)
+        return results
+
+    def lookup(self, phone_number):
+        """
+        :return: set of ids of the records sharing a canonized number with a raw phone number
+        """
+        return self.lookup_many([phone_number])[0]
+
+    def record_numbers(self, record_id):
+        """
+        :return: set of the canonized numbers of a record
+        """
+        query = ('SELECT numbers.canonized FROM numbers JOIN entries ON entries.entry_id = numbers.entry_id '
+                 'WHERE entries.record_id = ?')
+        return {canonized for canonized, in self._connection.execute(query, (record_id,))}
+
+    def duplicates(self, min_records=2):
+        """
+        :return: generator of (canonized number, set of record ids) of the numbers shared by at least
+        min_records records, by canonized number
+        """
+        query = ('SELECT numbers.canonized, entries.record_id FROM numbers '
+                 'JOIN entries ON entries.entry_id = numbers.entry_id '
+                 'WHERE numbers.canonized IN (SELECT numbers.canonized FROM numbers '
+                 'JOIN entries ON entries.entry_id = numbers.entry_id '
+                 'GROUP BY numbers.canonized HAVING COUNT(DISTINCT entries.record_id) >= ?) '
+                 'ORDER BY numbers.canonized')
+        rows = self._connection.execute(query, (min_records,))
+        for canonized, group in itertools.groupby(rows, key=lambda row: row[0]):
+            yield canonized, {record_id for _, record_id in group}
+
+    def duplicate_clusters(self):
+        """
+        groups records that share a canonized number, directly or through other records
+        (a shares a number with b, and b another number with c)
+        :return: list of sets of record ids, every set has at least 2 records
+        """
+        parents = {}
+
+        def find(record_id):
+            root = record_id
+            while parents[root] != root:
+                root = parents[root]
+            while parents[record_id] != root:
+                parents[record_id], record_id = root, parents[record_id]
+            return root
+
+        for canonized, record_ids in self.duplicates():
+            roots = set()
+            for record_id in record_ids:
+                parents.setdefault(record_id, record_id)
+                roots.add(find(record_id))
+            root = roots.pop()
+            for other_root in roots:
+                parents[other_root] = root
+
+        clusters = collections.defaultdict(set)
+        for record_id in parents:
+            clusters[find(record_id)].add(record_id)
+        return clusters.values()
+
+    def _iter_affected(self, diff):
+        """
+        :param diff: format_diff.FormatDiff
+        :return: generator of chunks of (entry_id, raw) of the entries diff may affect, by entry id.
+        the digits are searched by SQLite, so unaffected entries never reach python
+        """
+        literals = diff.search_literals()
+        if diff.is_full():
+            condition, parameters = '', []
+        elif len(literals) <= MAX_QUERY_PARAMETERS:
+            condition = ' AND ({0})'.format(' OR '.join(['instr(digits, ?) > 0'] * len(literals)))
+            parameters = literals
+        else:
+            # too many literals for a single query, searched in python instead
+            condition, parameters = '', []
+
+        last_entry_id = -1
+        while True:
+            query = 'SELECT entry_id, raw, digits FROM entries WHERE entry_id > ?{0} ORDER BY entry_id LIMIT ?'.format(
+                condition)
+            rows = self._connection.execute(query, [last_entry_id] + parameters + [self.chunk_size]).fetchall()
+            if not rows:
+                break
+            last_entry_id = rows[-1][0]
+            if not condition and not diff.is_full():
+                rows = [row for row in rows if any(literal in row[2] for literal in literals)]
+            yield [(entry_id, raw) for entry_id, raw, digits in rows]
+
+    def _recanonize_chunk(self, entries):
+        """
+        canonizes entries again, and replaces their numbers (single transaction)
+        :param entries: list of (entry_id, raw)
+        :return: amount of entries whose canonization changed
+        """
+        changed = 0
+        nothing = self.canonizer.NOTHING
+        with self._connection:
+            cursor = self._connection.cursor()
+            for entry_id, raw in entries:
+                canonized, code = self.canonizer.canonize_with_code(raw)
+                numbers = set(canonized) if code != nothing else set()
+                old_numbers = {number for number, in cursor.execute(
+                    'SELECT canonized FROM numbers WHERE entry_id = ?', (entry_id,))}
+                old_code = cursor.execute('SELECT code FROM entries WHERE entry_id = ?', (entry_id,)).fetchone()[0]
+                if numbers == old_numbers and code == old_code:
+                    continue
+                changed += 1
+                cursor.execute('UPDATE entries SET code = ? WHERE entry_id = ?', (code, entry_id))
+                cursor.execute('DELETE FROM numbers WHERE entry_id = ?', (entry_id,))
+                cursor.executemany('INSERT INTO numbers (canonized, entry_id) VALUES (?, ?)',
+                                   ((number, entry_id) for number in numbers))
+        return changed
+
+    def recanonize(self, diff=None):
+        """
+        Brings an index built with other formats up to date with the formats of the canonizer.
+        Only entries whose digits contain a prefix literal that changed (see format_diff.FormatDiff) are
+        canonized again, every entry when the diff is full
+        :param diff: format_diff.FormatDiff to apply, defaults to format_diff()
+        :rtype: tuple
+        :return: amount of entries canonized again, amount of them whose canonization changed
+        """
+        if diff is None:
+            diff = self.format_diff()
+
+        examined = changed = 0
+        if not diff.is_empty():
+            for entries in self._iter_affected(diff):
+                examined += len(entries)
+                changed += self._recanonize_chunk(entries)
+
+        with self._connection:
+            self._connection.executemany('UPDATE meta SET value = ? WHERE key = ?',
+                                         [(value, key) for key, value in self._formats_meta().iteritems()])
+        return examined, changed
+
+    def close(self):
+        self._connection.close()
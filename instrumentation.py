@@ -0,0 +1,122 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# instrumentation.py
+# Counts and times the stages of
+# the canonization pipeline
+#
+##################################
+
+import collections, timeit
+
+# Highest resolution wall clock of the platform
+clock = timeit.default_timer
+
+# Passed to the instrumentation callback after every canonization:
+# rules are the names of the stages that matched, in order ('fast_path' when the regexes were skipped)
+CanonizationEvent = collections.namedtuple('CanonizationEvent', ['phone_number', 'code', 'seconds', 'rules',
+                                                                 'extracted'])
+
+FAST_PATH = 'fast_path'
+
+
+class PipelineStats(object):
+    """
+    Counters of a single canonizer: calls, hits and time of every canonizing rule,
+    calls of the fast path and of the extraction, and outcome codes
+    """
+
+    def __init__(self, rule_names, outcome_names):
+        """
+        :param rule_names: names of the canonizing rules, in pipeline order
+        :param outcome_names: dict of outcome code to name
+        """
+        self.rule_names = list(rule_names)
+        self.outcome_names = outcome_names
+        self.rule_calls = dict.fromkeys(self.rule_names, 0)
+        self.rule_hits = dict.fromkeys(self.rule_names, 0)
+        self.rule_seconds = dict.fromkeys(self.rule_names, 0.0)
+        self.fast_path_calls = 0
+        self.fast_path_hits = 0
+        self.fast_path_seconds = 0.0
+        self.extract_calls = 0
+        self.extract_seconds = 0.0
+        self.outcomes = dict.fromkeys(outcome_names, 0)
+        self.canonizations = 0
+        self.seconds = 0.0
+        # rules that matched in the current canonization, and whether it was extracted
+        self.current_rules = []
+        self.current_extracted = False
+
+    def begin(self):
+        del self.current_rules[:]
+        self.current_extracted = False
+
+    def end(self, code, seconds):
+        self.canonizations += 1
+        self.seconds += seconds
+        self.outcomes[code] = self.outcomes.get(code, 0) + 1
+
+    def add_rule(self, name, is_hit, seconds):
+        self.rule_calls[name] += 1
+        self.rule_seconds[name] += seconds
+        if is_hit:
+            self.rule_hits[name] += 1
+            self.current_rules.append(name)
+
+    def add_rule_seconds(self, name, seconds):
+        self.rule_seconds[name] += seconds
+
+    def add_fast_path(self, is_hit, seconds):
+        self.fast_path_calls += 1
+        self.fast_path_seconds += seconds
+        if is_hit:
+            self.fast_path_hits += 1
+            self.current_rules.append(FAST_PATH)
+
+    def add_extract(self, seconds):
+        self.extract_calls += 1
+        self.extract_seconds += seconds
+        self.current_extracted = True
+
+    def snapshot(self):
+        """
+        :return: dict of all counters, safe to keep while counting goes on
+        """
+        rules = collections.OrderedDict(
+            (name, {'calls': self.rule_calls[name], 'hits': self.rule_hits[name], 'seconds': self.rule_seconds[name]})
+            for name in self.rule_names)
+        outcomes = dict((self.outcome_names.get(code, code), count) for code, count in self.outcomes.iteritems())
+        return {'canonizations': self.canonizations,
+                'seconds': self.seconds,
+                'outcomes': outcomes,
+                'rules': rules,
+                FAST_PATH: {'calls': self.fast_path_calls, 'hits': self.fast_path_hits,
+                            'seconds': self.fast_path_seconds},
+                'try_extract': {'calls': self.extract_calls, 'seconds': self.extract_seconds}}
+
+
+class TimedRegex(object):
+    """
+    Wraps a compiled regex of a canonizing rule, and reports its searches and substitutions to PipelineStats
+    """
+
+    __slots__ = ('regex', 'name', 'stats')
+
+    def __init__(self, regex, name, stats):
+        self.regex = regex
+        self.name = name
+        self.stats = stats
+
+    def search(self, string):
+        start = clock()
+        match = self.regex.search(string)
+        self.stats.add_rule(self.name, match is not None, clock() - start)
+        return match
+
+    def sub(self, replace, string):
+        start = clock()
+        result = self.regex.sub(replace, string)
+        self.stats.add_rule_seconds(self.name, clock() - start)
+        return result
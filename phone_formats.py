@@ -8,11 +8,177 @@
 #
 ##################################
 
-import re
+import os, re, json, hashlib, itertools, collections, sre_parse, sre_constants, format_trie, regex_backends
 
 GENERAL_SEPARATOR = r'[^\d\s,]{0,2}'
 OBLIGATED_SEPARATOR = r'[^\d\t\r\n,]{1,2}'
 
+# Builtin country definitions
+COUNTRIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'countries.json')
+_country_definitions = None
+
+# Result of CountryPhone.classify: kind is 'line' or 'mobile', phone is the Phone that kind
+PhoneClass = collections.namedtuple('PhoneClass', ['kind', 'phone', 'phone_format'])
+
+# Widest prefix that is expanded to its literals (10 ** width strings are checked)
+MAX_PREFIX_WIDTH = 4
+# Expanded prefixes by (prefix, max_width), see PhoneFormat.prefix_literals. countries share most prefixes
+_prefix_literals = {}
+
+# Version of the fingerprints, part of every fingerprint. bumped whenever their computation changes
+FINGERPRINT_VERSION = 2
+
+
+def _is_digit_set(items):
+    """
+    :param items: parsed items of a character set ([...])
+    :return: True if the set has digits only
+    """
+    if items and items[0][0] == sre_constants.NEGATE:
+        return (sre_constants.CATEGORY, sre_constants.CATEGORY_NOT_DIGIT) in items
+    for op, value in items:
+        if op == sre_constants.LITERAL and not chr(value).isdigit():
+            return False
+        if op == sre_constants.RANGE and not (ord('0') <= value[0] and value[1] <= ord('9')):
+            return False
+        if op == sre_constants.CATEGORY and value != sre_constants.CATEGORY_DIGIT:
+            return False
+        if op not in (sre_constants.LITERAL, sre_constants.RANGE, sre_constants.CATEGORY):
+            return False
+    return True
+
+
+def _matches_digits_only(parsed):
+    """
+    :param parsed: parsed regex (sre_parse)
+    :return: True if every string the regex matches is made of digits
+    """
+    for op, value in parsed:
+        if op == sre_constants.LITERAL:
+            if not chr(value).isdigit():
+                return False
+        elif op == sre_constants.IN:
+            if not _is_digit_set(value):
+                return False
+        elif op == sre_constants.SUBPATTERN:
+            if not _matches_digits_only(value[-1]):
+                return False
+        elif op == sre_constants.BRANCH:
+            if not all(_matches_digits_only(branch) for branch in value[1]):
+                return False
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            if not _matches_digits_only(value[2]):
+                return False
+        else:
+            return False
+    return True
+
+
+def _digit_class(digits):
+    """
+    :param digits: sorted digits
+    :return: regex of a single digit out of digits, with consecutive digits as ranges ([2-489])
+    """
+    if len(digits) == 1:
+        return digits[0]
+    if len(digits) == 10:
+        return '\\d'
+
+    runs = []
+    for digit in digits:
+        if runs and ord(digit) == ord(runs[-1][-1]) + 1:
+            runs[-1].append(digit)
+        else:
+            runs.append([digit])
+    parts = [run[0] + '-' + run[-1] if len(run) > 2 else ''.join(run) for run in runs]
+    return '[{0}]'.format(''.join(parts))
+
+
+# Regex created by _length_regex
+_LENGTH_REGEX = re.compile(r'^\\d\{(\d+)(?:,(\d+))?\}$')
+
+
+def _length_regex(min_length, max_length):
+    """
+    :return: regex of min_length to max_length digits
+    """
+    if max_length == 0:
+        return ''
+    if min_length == max_length:
+        return '\\d{{{0}}}'.format(min_length)
+    return '\\d{{{0},{1}}}'.format(min_length, max_length)
+
+
+def _merge_ranges(ranges):
+    """
+    :return: sorted list of the (min, max) ranges, where overlapping and adjacent ranges are merged
+    """
+    merged = []
+    for min_length, max_length in sorted(ranges):
+        if merged and min_length <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], max_length))
+        else:
+            merged.append((min_length, max_length))
+    return merged
+
+
+def _factor_trie_node(node):
+    """
+    :param node: node of a format_trie.FormatTrie
+    :return: regex of the rest of the numbers from this node on (without capturing groups)
+    """
+    alternatives = []
+
+    # children whose rest is the same share a character class
+    digits_by_regex = {}
+    for digit in sorted(key for key in node if key is not format_trie._FORMATS):
+        digits_by_regex.setdefault(_factor_trie_node(node[digit]), []).append(digit)
+    for rest_regex, digits in sorted(digits_by_regex.iteritems(), key=lambda item: item[1]):
+        lengths = _LENGTH_REGEX.match(rest_regex)
+        if len(digits) == 10 and lengths:
+            # any digit followed by n digits is n + 1 digits
+            min_length = int(lengths.group(1))
+            max_length = int(lengths.group(2) or min_length)
+            alternatives.append(_length_regex(min_length + 1, max_length + 1))
+        else:
+            alternatives.append(_digit_class(digits) + rest_regex)
+
+    ranges = [(format_min, format_max) for order, format_min, format_max, format_match
+              in node.get(format_trie._FORMATS, ())]
+    alternatives.extend(_length_regex(range_min, range_max) for range_min, range_max in _merge_ranges(ranges))
+
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return '(?:{0})'.format('|'.join(alternatives))
+
+
+def _non_capturing(pattern):
+    """
+    :return: pattern with its unnamed groups made non capturing, so it adds no groups when embedded
+    in a bigger regex (python 2 re supports up to 100 groups)
+    """
+    parts = []
+    # index of the first member of the character set the index is in, None when out of sets
+    set_start = None
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            parts.append(pattern[index:index + 2])
+            index += 2
+            continue
+        if set_start is not None:
+            # a ] that is the first member doesn't end the set
+            if char == ']' and index != set_start:
+                set_start = None
+        elif char == '[':
+            set_start = index + 2 if pattern[index + 1:index + 2] == '^' else index + 1
+        elif char == '(' and pattern[index + 1:index + 2] != '?':
+            char = '(?:'
+        parts.append(char)
+        index += 1
+    return ''.join(parts)
+
 
 def _stronger_value(original, replacement):
     """
@@ -30,16 +196,60 @@ class FormatList(list):
     Allows exporting to many different formats
     """
 
+    # canonized alternatives are factored over their prefixes (see _create_factored_regex)
+    factor_alternatives = True
+
     def __init__(self, format_list=list(), country_code='', is_strict=True, is_canonized=True):
         super(FormatList, self).__init__(format_list)
         self._is_canonized = is_canonized
         self._is_strict = is_strict
         self.country_code = country_code
+        self._regex_cache = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._generation = 0
+        self._trie = None
+        self._factored_regex = None
+
+    def clear_cache(self):
+        """
+        Drops every compiled regex. Must be called whenever the formats change
+        """
+        self._regex_cache.clear()
+        self._trie = None
+        self._factored_regex = None
+        self._generation += 1
+
+    def cache_info(self):
+        """
+        :return: dict of compiled regex cache statistics (hits, misses, size)
+        """
+        return {'hits': self._cache_hits, 'misses': self._cache_misses, 'size': len(self._regex_cache)}
+
+    def fingerprint(self):
+        """
+        :return: versioned digest of the formats and flags of this list, "v<FINGERPRINT_VERSION>:<hex digest>"
+        """
+        formats = [(phone_format.prefix, phone_format.min_length, phone_format.max_length) for phone_format in self]
+        state = (FINGERPRINT_VERSION, self._is_strict, self._is_canonized, formats)
+        return 'v{0}:{1}'.format(FINGERPRINT_VERSION, hashlib.sha1(repr(state)).hexdigest())
 
     def copy(self):
         return FormatList(self, country_code=self.country_code, is_strict=self._is_strict,
                           is_canonized=self._is_canonized)
 
+    def to_trie(self):
+        """
+        Compiles the formats into a FormatTrie (cached)
+        :return: FormatTrie, or None if a prefix can't be compiled to a trie
+        """
+        if self._trie is None:
+            try:
+                self._trie = format_trie.FormatTrie((None, phone_format) for phone_format in self)
+            except ValueError:
+                self._trie = False
+        return self._trie or None
+
     def to_find_regex(self, is_strict=False, country_code='', optional_country=False, is_canonized=True, stuck_zero=False):
         """
         Creates a final compiled regex that will find phone numbers
@@ -70,9 +280,34 @@ class FormatList(list):
         country_code = _stronger_value(self.country_code, country_code)
         is_canonized = _stronger_value(self._is_canonized, is_canonized)
 
+        cache_key = (absolute_anchors, is_strict, country_code, optional_country, is_canonized, stuck_zero)
+        compiled = self._regex_cache.get(cache_key)
+        if compiled is not None:
+            self._cache_hits += 1
+            return compiled
+
+        self._cache_misses += 1
+        compiled = regex_backends.compile(self._create_full_pattern(absolute_anchors=absolute_anchors, is_strict=is_strict,
+                                                        country_code=country_code, optional_country=optional_country,
+                                                        is_canonized=is_canonized, stuck_zero=stuck_zero))
+        self._regex_cache[cache_key] = compiled
+        return compiled
+
+    def _create_full_pattern(self, absolute_anchors, is_strict, country_code, optional_country, is_canonized,
+                             stuck_zero, group_name='phone', anchored=True):
+        """
+        create the full regex pattern string. params are already resolved by _create_full_regex
+        group_name: name of the group capturing the phone number
+        anchored: False leaves out the anchors, so the pattern can be embedded in a bigger regex.
+        its only capturing group is then group_name
+        """
+
         orred_regexes = self._create_orred_regexes(is_canonized=is_canonized)
 
-        if absolute_anchors:
+        if not anchored:
+            start_anchor = ''
+            end_anchor = ''
+        elif absolute_anchors:
             start_anchor = '^'
             end_anchor = '$'
         else:
@@ -91,22 +326,26 @@ class FormatList(list):
 
         if is_strict and country_code:  # with country code
             if is_canonized:
-                final_regex = "{start_anchor}(?P<phone>0*{country}{alt}){end_anchor}".format(start_anchor=start_anchor,
-                                                                                             end_anchor=end_anchor,
-                                                                                             country=country_code,
-                                                                                             alt=orred_regexes)
+                final_regex = "{start_anchor}(?P<{group}>0*{country}{alt}){end_anchor}".format(
+                    start_anchor=start_anchor,
+                    group=group_name,
+                    end_anchor=end_anchor,
+                    country=country_code,
+                    alt=orred_regexes)
             else:
                 if not optional_country:
-                    final_regex = "{start_anchor}(?P<phone>{country}{sep}{zero}{alt}){end_anchor}".format(
+                    final_regex = "{start_anchor}(?P<{group}>{country}{sep}{zero}{alt}){end_anchor}".format(
                         start_anchor=start_anchor,
+                        group=group_name,
                         end_anchor=end_anchor,
                         sep=separator,
                         country=country_code,
                         alt=orred_regexes,
                         zero=optional_zero)
                 else:
-                    final_regex = "{start_anchor}(?P<phone>0*({country}{sep})?{zero}{alt}){end_anchor}".format(
+                    final_regex = "{start_anchor}(?P<{group}>0*({country}{sep})?{zero}{alt}){end_anchor}".format(
                         start_anchor=start_anchor,
+                        group=group_name,
                         end_anchor=end_anchor,
                         sep=separator,
                         country=country_code,
@@ -114,29 +353,34 @@ class FormatList(list):
                         zero=optional_zero)
         elif not country_code:
             # No Country code given
-            final_regex = "{start_anchor}(?P<phone>0*({alt})){end_anchor}".format(start_anchor=start_anchor,
-                                                                                  end_anchor=end_anchor,
-                                                                                  country=country_code,
-                                                                                  alt=orred_regexes)
+            final_regex = "{start_anchor}(?P<{group}>0*({alt})){end_anchor}".format(start_anchor=start_anchor,
+                                                                                    group=group_name,
+                                                                                    end_anchor=end_anchor,
+                                                                                    country=country_code,
+                                                                                    alt=orred_regexes)
         elif country_code:
             # Country code given, but optional
-            final_regex = "{start_anchor}(?P<phone>0*({country}{sep})?{zero}{alt}){end_anchor}".format(
+            final_regex = "{start_anchor}(?P<{group}>0*({country}{sep})?{zero}{alt}){end_anchor}".format(
                 start_anchor=start_anchor,
+                group=group_name,
                 end_anchor=end_anchor,
                 country=country_code,
                 sep=separator,
                 alt=orred_regexes,
                 zero=optional_zero)
         else:
-            final_regex = "{start_anchor}(?P<phone>(0*{country}{sep})?{zero}{alt}){end_anchor}".format(
+            final_regex = "{start_anchor}(?P<{group}>(0*{country}{sep})?{zero}{alt}){end_anchor}".format(
                 start_anchor=start_anchor,
+                group=group_name,
                 end_anchor=end_anchor,
                 sep=separator,
                 country=country_code,
                 alt=orred_regexes,
                 zero=optional_zero)
 
-        return re.compile(final_regex)
+        if not anchored:
+            return _non_capturing(final_regex)
+        return final_regex
 
     def _create_reversed_regex(self):
         """
@@ -166,7 +410,7 @@ class FormatList(list):
                                                                           min=phone_format.min_length,
                                                                           max=phone_format.max_length)
             else:
-                current_regex = "{prefix}{sep}(\\d{sep}){{{min},{max}}}\\d".format(prefix=phone_format.prefix,
+                current_regex = "{prefix}{sep}(?:\\d{sep}){{{min},{max}}}\\d".format(prefix=phone_format.prefix,
                                                                                          sep=GENERAL_SEPARATOR,
                                                                                          min=phone_format.min_length - 1,
                                                                                          max=phone_format.max_length - 1)
@@ -176,17 +420,37 @@ class FormatList(list):
 
     def _or_regexes(self, regexes):
         """
-        Creates a big regex or-ing between smaller regexes
+        Creates a big regex or-ing between smaller regexes.
+        only the outer group captures (canonizing rules refer to it)
         """
 
-        with_bracks = map(lambda x: "({0})".format(x), regexes)  # Add brackets #Only add brackets
+        with_bracks = map(lambda x: "(?:{0})".format(x), regexes)  # Add brackets #Only add brackets
         regexes_orred = '|'.join(with_bracks)
         return "({0})".format(regexes_orred)
 
+    def _create_factored_regex(self):
+        """
+        Creates the canonized regexes of all phone formats as a single regex, factored over a digit trie
+        of their prefixes: shared prefixes are matched once, digits leading to the same rest share a character
+        class, and overlapping lengths after the same prefix are merged. it matches the same strings as
+        _or_regexes, but tries far less branches.
+        only the outer group captures, like _or_regexes
+        :return: regex (cached), or None when a prefix can't be expanded (see PhoneFormat.prefix_literals)
+        """
+        if self._factored_regex is None:
+            trie = self.to_trie() if self else None
+            self._factored_regex = False if trie is None else "({0})".format(_factor_trie_node(trie._root))
+        return self._factored_regex or None
+
     def _create_orred_regexes(self, is_canonized=True):
         """
         create regexes for all phone formats, and OR them in a big regex
         """
+        if is_canonized and self.factor_alternatives:
+            factored_regex = self._create_factored_regex()
+            if factored_regex is not None:
+                return factored_regex
+
         regexes = self._create_regexes(is_canonized)
         orred_regexes = self._or_regexes(regexes)
         return orred_regexes
@@ -211,6 +475,7 @@ class Phone(object):
         """
 
         self.formats.append(phone_format)
+        self.formats.clear_cache()
 
     def _get_abs_min_max(self):
         """
@@ -227,9 +492,12 @@ class Phone(object):
         Checks if phone_number matches any of the current formats.
         if no country code is given, it doesnt look for any
         """
+        phone_trie = self.formats.to_trie()
+        if phone_trie is not None and isinstance(phone_number, basestring):
+            return phone_trie.match_number(phone_number, country_code) is not None
+
         phone_regex = self.formats.to_exact_regex(country_code=country_code)
-        print phone_regex.pattern
-        match = re.search(phone_regex, phone_number)
+        match = phone_regex.search(phone_number)
         if match:
             return True
         return False
@@ -259,6 +527,8 @@ class CountryPhone(object):
             self.line_phone = line_phone
 
         self.min_length, self.max_length = self._abs_min_max()
+        self._format_lists = {}
+        self._classifier = None
 
     def _abs_min_max(self):
         """
@@ -291,11 +561,138 @@ class CountryPhone(object):
         """
         return self.is_valid_line(phone_number, is_strict) or self.is_valid_mobile(phone_number, is_strict)
 
+    def classify(self, phone_number, is_strict=True):
+        """
+        Finds out in a single pass whether phone_number is a line or a mobile number, and which format matched.
+        line numbers win, like in is_valid
+        :return: PhoneClass (kind, phone, phone_format), or None if phone_number is not valid
+        """
+        country_code = self.country_code if is_strict else ''
+        stamp, trie, regexes = self._get_classifier()
+
+        if trie is not None and isinstance(phone_number, basestring):
+            mobile_match = None
+            for format_match in trie.iter_number_matches(phone_number, country_code):
+                if format_match.phone is self.line_phone:
+                    return PhoneClass('line', format_match.phone, format_match.phone_format)
+                if mobile_match is None:
+                    mobile_match = format_match
+            if mobile_match is None:
+                return None
+            return PhoneClass('mobile', mobile_match.phone, mobile_match.phone_format)
+
+        if country_code not in regexes:
+            regexes[country_code] = self._create_classify_regex(country_code)
+        classify_regex, tags = regexes[country_code]
+        match = classify_regex.search(phone_number)
+        if match is None or match.lastgroup is None:
+            return None
+        return tags[match.lastgroup]
+
+    def classifymany(self, phone_numbers, is_strict=True):
+        """
+        :param phone_numbers: List of phone numbers we want to classify
+        :return: List of PhoneClass (None for invalid numbers), see classify
+        """
+        return [self.classify(phone_number, is_strict) for phone_number in phone_numbers]
+
+    def _get_classifier(self):
+        """
+        :return: tuple of formats stamp, FormatTrie of all formats (None if a prefix can't be compiled to a trie)
+        and dict of country code to classify regex. rebuilt only when a phone's formats changed
+        """
+        stamp = self._formats_stamp()
+        if self._classifier is None or self._classifier[0] != stamp:
+            try:
+                trie = format_trie.FormatTrie.from_country(self)
+            except ValueError:
+                trie = None
+            self._classifier = (stamp, trie, {})
+        return self._classifier
+
+    def _create_classify_regex(self, country_code):
+        """
+        regex equivalent of classify: the exact regexes of the line and mobile formats OR-ed in that order,
+        with a named group per format
+        :return: tuple of compiled regex, dict of group name to PhoneClass
+        """
+        tags = {}
+        kind_regexes = []
+        for kind, phone in (('line', self.line_phone), ('mobile', self.mobile_phone)):
+            alternatives = []
+            for phone_format in phone.formats:
+                group_name = 'f{0}'.format(len(tags))
+                tags[group_name] = PhoneClass(kind, phone, phone_format)
+                alternatives.append("(?P<{group}>{prefix}\\d{{{min},{max}}})".format(
+                    group=group_name, prefix=phone_format.prefix, min=phone_format.min_length,
+                    max=phone_format.max_length))
+            if alternatives:
+                country = "(?:{0})?".format(country_code) if country_code else ''
+                kind_regexes.append("0*{country}(?:{alt})".format(country=country, alt='|'.join(alternatives)))
+
+        return regex_backends.compile("^(?:{0})$".format('|'.join(kind_regexes)),
+                                      features=[regex_backends.LAST_GROUP]), tags
+
     def get_phone_formats(self):
         formats = self.mobile_phone.formats.copy()
         formats.extend(self.line_phone.formats)
         return formats
 
+    def _formats_stamp(self):
+        """
+        :return: value that changes whenever a format is added to the mobile or line phone
+        """
+        mobile_formats = self.mobile_phone.formats
+        line_formats = self.line_phone.formats
+        return id(mobile_formats), mobile_formats._generation, id(line_formats), line_formats._generation
+
+    def _get_format_list(self, is_strict, is_canonized):
+        """
+        :return: cached FormatList of all formats, rebuilt only when a phone's formats changed
+        """
+        stamp = self._formats_stamp()
+        stamp_and_list = self._format_lists.get((is_strict, is_canonized))
+        if stamp_and_list is None or stamp_and_list[0] != stamp:
+            format_list = FormatList(self.get_phone_formats(), country_code=self.country_code,
+                                     is_strict=is_strict, is_canonized=is_canonized)
+            stamp_and_list = (stamp, format_list)
+            self._format_lists[(is_strict, is_canonized)] = stamp_and_list
+        return stamp_and_list[1]
+
+    def fingerprint(self):
+        """
+        :return: versioned digest of everything the regexes of this country are generated from,
+        "v<FINGERPRINT_VERSION>:<hex digest>". changes whenever a format, the country code or a flag changes
+        (see format_diff.diff_country_phones for what changed)
+        """
+        phones = [(kind, phone.formats.fingerprint())
+                  for kind, phone in (('mobile', self.mobile_phone), ('line', self.line_phone))]
+        state = (FINGERPRINT_VERSION, self.country, self.country_code, self._is_strict, self._is_canonized, phones)
+        return 'v{0}:{1}'.format(FINGERPRINT_VERSION, hashlib.sha1(repr(state)).hexdigest())
+
+    def to_definition(self):
+        """
+        :return: country definition of this country (see load_country_definitions), json serializable
+        """
+        formats = {}
+        for kind, phone in (('mobile', self.mobile_phone), ('line', self.line_phone)):
+            formats[kind] = [{'prefix': phone_format.prefix, 'min_length': phone_format.min_length,
+                              'max_length': phone_format.max_length, 'comment': phone_format.comment}
+                             for phone_format in phone.formats]
+        return {'country': self.country, 'country_code': self.country_code, 'formats': formats}
+
+    def cache_info(self):
+        """
+        :return: dict of compiled regex cache statistics, summed over all of this country's format lists
+        """
+        info = {'hits': 0, 'misses': 0, 'size': 0}
+        format_lists = [self.mobile_phone.formats, self.line_phone.formats]
+        format_lists.extend(format_list for stamp, format_list in self._format_lists.itervalues())
+        for format_list in format_lists:
+            for key, value in format_list.cache_info().iteritems():
+                info[key] += value
+        return info
+
     def to_find_regex(self, is_strict=None, is_canonized=None, with_country=True, optional_country=False, stuck_zero=False):
         """
         Creates a final compiled regex that will find phone numbers
@@ -326,8 +723,7 @@ class CountryPhone(object):
         is_canonized = _stronger_value(self._is_canonized, is_canonized)
         is_strict = _stronger_value(self._is_strict, is_strict)
 
-        format_list = FormatList(self.get_phone_formats(), country_code=self.country_code,
-            is_strict=is_strict, is_canonized=is_canonized)
+        format_list = self._get_format_list(is_strict, is_canonized)
 
         if with_country:
             return format_list._create_full_regex(absolute_anchors=absolute_anchors,
@@ -343,6 +739,30 @@ class CountryPhone(object):
                                               is_canonized=is_canonized,
                                               stuck_zero=stuck_zero)
 
+    def _create_phone_pattern(self, phone, group_name, is_strict=None, is_canonized=None, with_country=True,
+                              optional_country=False, stuck_zero=False):
+        """
+        :param phone: Phone instance of this country (mobile_phone or line_phone)
+        :param group_name: name of the group capturing the phone number
+        :return: unanchored, uncompiled pattern of a single phone kind, so it can be or-ed with other patterns.
+        group_name is its only capturing group
+        """
+
+        is_canonized = _stronger_value(self._is_canonized, is_canonized)
+        is_strict = _stronger_value(self._is_strict, is_strict)
+
+        if with_country:
+            country_code = self.country_code
+        else:
+            country_code = ''
+
+        format_list = FormatList(phone.formats, country_code=self.country_code, is_strict=is_strict,
+                                 is_canonized=is_canonized)
+        return format_list._create_full_pattern(absolute_anchors=False, is_strict=is_strict,
+                                                country_code=country_code, optional_country=optional_country,
+                                                is_canonized=is_canonized, stuck_zero=stuck_zero,
+                                                group_name=group_name, anchored=False)
+
     def _parse_phones_dict(self, phones_dict, is_strict=True, is_canonized=True):
         """
         Gets a dict of PhoneFormat instances. parses it to mobile and line phones_dict
@@ -383,56 +803,99 @@ class PhoneFormat(object):
         self.max_length = max_length
         self.comment = comment
 
+    def prefix_literals(self, max_width=MAX_PREFIX_WIDTH):
+        """
+        Expands the prefix regex to every digit string it matches. expansions are remembered by prefix
+        :return: frozenset of digit strings, or None if the prefix is wider than max_width,
+        may match a non digit, or behaves differently when not grouped (top level '|')
+        """
+        key = (self.prefix, max_width)
+        if key not in _prefix_literals:
+            _prefix_literals[key] = self._expand_prefix(max_width)
+        return _prefix_literals[key]
+
+    def _expand_prefix(self, max_width):
+        """
+        :return: prefix_literals, computed
+        """
+        parsed = sre_parse.parse(self.prefix)
+        min_width, prefix_width = parsed.getwidth()
+        if prefix_width > max_width or not _matches_digits_only(parsed):
+            return None
+
+        grouped_regex = re.compile('^(?:{0})$'.format(self.prefix))
+        raw_regex = re.compile('^{0}$'.format(self.prefix))
+        literals = set()
+        for width in xrange(min_width, prefix_width + 1):
+            for digits in itertools.product('0123456789', repeat=width):
+                literal = ''.join(digits)
+                is_match = grouped_regex.match(literal) is not None
+                if is_match != (raw_regex.match(literal) is not None):
+                    return None
+                if is_match:
+                    literals.add(literal)
+
+        return frozenset(literals)
+
+
+def load_country_definitions(path=COUNTRIES_FILE):
+    """
+    Reads country definitions from a json file. every definition has country, country_code,
+    and formats: a dict of phone kind (line, mobile) to a list of PhoneFormat params
+    :return: dict of country name to definition
+    """
+    with open(path) as definitions_file:
+        return json.load(definitions_file, object_hook=_str_values)
+
+
+def _str_values(json_object):
+    """
+    json gives unicode strings. keep them str, like the rest of the regexes
+    """
+    return dict((str(key), str(value) if isinstance(value, unicode) else value)
+                for key, value in json_object.iteritems())
+
+
+def country_definitions():
+    """
+    :return: dict of the definitions of all builtin countries (COUNTRIES_FILE), read once
+    """
+    global _country_definitions
+    if _country_definitions is None:
+        _country_definitions = load_country_definitions()
+    return _country_definitions
+
+
+def create_country_phone(definition, is_strict=True, is_canonized=True):
+    """
+    :param definition: country definition, see load_country_definitions
+    :return: CountryPhone instance of the definition
+    """
+    phones_dict = dict((kind, [PhoneFormat(**format_params) for format_params in formats])
+                       for kind, formats in definition['formats'].iteritems())
+    return CountryPhone(country=definition['country'], country_code=definition['country_code'],
+                        is_strict=is_strict, is_canonized=is_canonized, phones_dict=phones_dict)
+
 
 def create_israeli_phone(is_strict=True, is_canonized=True):
     """
     :return: Instance of israeli phone number
     """
-    israeli_formats = {
-        'line': [
-            PhoneFormat(prefix='[23489]', min_length=7, max_length=7, comment=r'geographic prefixes'),
-            PhoneFormat(prefix='7', min_length=8, max_length=8, comment=r'non geographic Landline and VoIP')
-        ],
-
-        'mobile': [PhoneFormat(prefix='5[^\\D]', min_length=7, max_length=7,
-                               comment=r'55 prefix is for virtual network operators')]
-    }
-    return CountryPhone(country='israel', country_code='972', is_strict=is_strict,
-                        is_canonized=is_canonized, phones_dict=israeli_formats)
+    return create_country_phone(country_definitions()['israel'], is_strict=is_strict, is_canonized=is_canonized)
 
 
 def create_belgian_phone(is_strict=True, is_canonized=True):
     """
     :return: Create instance of belgian phone number
     """
-    belgian_formats = {
-        'line': [
-            PhoneFormat(prefix='[^\\D0]', min_length=7, max_length=7, comment=r'geographic prefixes'),
-            PhoneFormat(prefix='(70|78|90)', min_length=6, max_length=6,
-                        comment=r'non geographic, mostly services'),
-            PhoneFormat(prefix='800', min_length=7, max_length=7, comment=r'non geographic, mostly services')
-        ],
-
-        'mobile': [PhoneFormat(prefix='4[6789]', min_length=7, max_length=7)]
-    }
-    return CountryPhone(country='belgium', country_code='32', is_strict=is_strict,
-                        is_canonized=is_canonized, phones_dict=belgian_formats)
+    return create_country_phone(country_definitions()['belgium'], is_strict=is_strict, is_canonized=is_canonized)
 
 
 def create_holland_phone(is_strict=True, is_canonized=True):
     """
     :return: Create instance of dutch phone number
     """
-    france_formats = {
-        'line': [
-            PhoneFormat(prefix='[12345]', min_length=8, max_length=8, comment=r'geographic prefixes'),
-            PhoneFormat(prefix='[89]', min_length=6, max_length=6, comment=r'non geographic, mostly services')
-        ],
-
-        'mobile': [PhoneFormat(prefix='[67]', min_length=8, max_length=8)]
-    }
-    return CountryPhone(country='france', country_code='33', is_strict=is_strict,
-                        is_canonized=is_canonized, phones_dict=france_formats)
+    return create_country_phone(country_definitions()['holland'], is_strict=is_strict, is_canonized=is_canonized)
 
 
 def create_all_phones(is_strict=True, is_canonized=True):
@@ -440,8 +903,7 @@ def create_all_phones(is_strict=True, is_canonized=True):
     :return: dict of all phone formats
     """
 
-    phone_formats = {'israel': create_israeli_phone(is_strict, is_canonized),
-                     'belgium': create_belgian_phone(is_strict, is_canonized),
-                     'holland': create_holland_phone(is_strict, is_canonized)}
-    
+    phone_formats = dict((country, create_country_phone(definition, is_strict, is_canonized))
+                         for country, definition in country_definitions().iteritems())
+
     return phone_formats
@@ -0,0 +1,143 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# regex_backends.py
+# Compiles patterns with the first
+# preferred regex engine that
+# supports them
+#
+##################################
+
+import os, re, collections
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# Comma separated backend names, most preferred first (like "re2,regex"). stdlib re is always the last resort
+BACKENDS_ENVIRONMENT_VARIABLE = 'PHONE_REGEX_BACKENDS'
+
+# Features a compiled pattern may be used with, that not every backend has
+NAMED_SUBSTITUTION = 'named_substitution'  # sub() templates referring to groups by name (\g<name>)
+LAST_GROUP = 'last_group'  # match.lastgroup, the name of the last group that matched
+# '$' matching before a trailing newline too, like re does. patterns with '$' always need it (see select)
+END_BEFORE_NEWLINE = 'end_before_newline'
+
+# RE2 runs in linear time, but has no lookarounds and no backreferences, which fail to compile.
+# its '$' only matches at the very end of the text, so canonizing and exact regexes are left to the others
+RE2_UNSUPPORTED = (NAMED_SUBSTITUTION, LAST_GROUP, END_BEFORE_NEWLINE)
+
+
+class Backend(object):
+    """
+    A regex engine. Patterns it can't compile (its error is raised) or that need an unsupported feature
+    are compiled by the next backend
+    """
+
+    def __init__(self, name, module, unsupported=()):
+        self.name = name
+        self.module = module
+        self.unsupported = frozenset(unsupported)
+        self.error = getattr(module, 'error', Exception)
+
+    def __repr__(self):
+        return 'Backend({0})'.format(self.name)
+
+    def supports(self, features):
+        return not self.unsupported.intersection(features)
+
+    def compile(self, pattern, flags=0):
+        return self.module.compile(pattern, flags)
+
+
+# Installed backends by name
+BACKENDS = collections.OrderedDict([('re', Backend('re', re))])
+if regex is not None:
+    BACKENDS['regex'] = Backend('regex', regex)
+if re2 is not None:
+    BACKENDS['re2'] = Backend('re2', re2, unsupported=RE2_UNSUPPORTED)
+
+_preferred = []
+# amount of patterns compiled by every backend
+_compiled_counts = collections.Counter()
+
+
+def available_backends():
+    """
+    :return: list of the names of the installed backends
+    """
+    return list(BACKENDS)
+
+
+def get_backends():
+    """
+    :return: list of the names of the preferred backends, most preferred first
+    """
+    return [backend.name for backend in _preferred]
+
+
+def set_backends(names):
+    """
+    Sets the preferred backends of the patterns compiled from now on. compiled patterns are not changed,
+    so set them before creating phones, canonizers and finders.
+    Patterns that rely on a behavior a backend lacks (see RE2_UNSUPPORTED) are compiled by the next one
+    :param names: backend names, most preferred first. stdlib re is always tried last
+    :return: list of the previously preferred names
+    :raise ValueError: when a backend is not installed
+    """
+    missing = [name for name in names if name not in BACKENDS]
+    if missing:
+        raise ValueError('Regex backends not installed: {0}'.format(', '.join(missing)))
+
+    previous = get_backends()
+    _preferred[:] = [BACKENDS[name] for name in names]
+    return previous
+
+
+def select(pattern, flags=0, features=()):
+    """
+    :param features: features the compiled pattern is used with, that a backend must support.
+    END_BEFORE_NEWLINE is added to patterns with '$'
+    :return: tuple of (backend name, compiled pattern) of the first preferred backend that compiles pattern
+    :raise re.error: when stdlib re, the last resort, can't compile pattern either
+    """
+    if '$' in pattern:
+        features = list(features) + [END_BEFORE_NEWLINE]
+    for backend in _preferred:
+        if not backend.supports(features):
+            continue
+        try:
+            compiled = backend.compile(pattern, flags)
+        except backend.error:
+            continue
+        _compiled_counts[backend.name] += 1
+        return backend.name, compiled
+
+    _compiled_counts['re'] += 1
+    return 're', re.compile(pattern, flags)
+
+
+def compile(pattern, flags=0, features=()):
+    """
+    Drop in replacement of re.compile, by the preferred backends (see select)
+    """
+    return select(pattern, flags, features)[1]
+
+
+def info():
+    """
+    :return: dict of backend name to the amount of patterns it compiled
+    """
+    return dict(_compiled_counts)
+
+
+# backends that are not installed are skipped, re is always there to fall back to
+set_backends([name.strip() for name in os.environ.get(BACKENDS_ENVIRONMENT_VARIABLE, '').split(',')
+              if name.strip() in BACKENDS])
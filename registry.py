@@ -0,0 +1,133 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# registry.py
+# Country phones and canonizers,
+# built on first use out of the
+# country definitions file
+#
+##################################
+
+import phone_formats, canonization, snapshot
+
+
+class CountryRegistry(object):
+    """
+    Registry of the countries of a definitions file (see phone_formats.load_country_definitions).
+    Nothing is read before the first use, and a country is built and compiled only when it is asked for,
+    so the amount of countries in the file doesn't slow down short lived processes
+    """
+
+    def __init__(self, path=phone_formats.COUNTRIES_FILE, snapshot_path=None):
+        """
+        :param path: country definitions file
+        :param snapshot_path: optional snapshot (see snapshot.save_snapshot). canonizers of the countries
+        it has are loaded from it instead of generating their patterns
+        """
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self._definitions = None
+        self._snapshot_states = None
+        self._phones = {}
+        self._canonizers = {}
+
+    def __repr__(self):
+        return 'CountryRegistry({0})'.format(self.path)
+
+    def __contains__(self, country):
+        return country in self.definitions()
+
+    def definitions(self):
+        """
+        :return: dict of country name to definition, read on first use
+        """
+        if self._definitions is None:
+            if self.path == phone_formats.COUNTRIES_FILE:
+                self._definitions = phone_formats.country_definitions()
+            else:
+                self._definitions = phone_formats.load_country_definitions(self.path)
+        return self._definitions
+
+    def names(self):
+        """
+        :return: sorted list of country names
+        """
+        return sorted(self.definitions())
+
+    def _definition(self, country):
+        try:
+            return self.definitions()[country]
+        except KeyError:
+            raise ValueError('Unknown country {0!r}'.format(country))
+
+    def get_phone(self, country, is_strict=True, is_canonized=True):
+        """
+        :return: CountryPhone of country, built once per options
+        :raise ValueError: when country is not in the definitions
+        """
+        key = (country, is_strict, is_canonized)
+        country_phone = self._phones.get(key)
+        if country_phone is None:
+            country_phone = phone_formats.create_country_phone(self._definition(country), is_strict=is_strict,
+                                                               is_canonized=is_canonized)
+            self._phones[key] = country_phone
+        return country_phone
+
+    def _snapshot_state(self, country):
+        """
+        :return: snapshot state of country, or None without snapshot or if the snapshot doesn't have it
+        """
+        if self.snapshot_path is None:
+            return None
+        if self._snapshot_states is None:
+            self._snapshot_states = snapshot.read_snapshot(self.snapshot_path)
+        return self._snapshot_states.get(country)
+
+    def get_canonizer(self, country, cache_size=None):
+        """
+        :return: CountryCanonizer of country, built once per cache size
+        :raise ValueError: when country is not in the definitions
+        :raise snapshot.SnapshotError: when the snapshot is stale
+        """
+        key = (country, cache_size)
+        canonizer = self._canonizers.get(key)
+        if canonizer is None:
+            country_phone = phone_formats.create_country_phone(self._definition(country))
+            state = self._snapshot_state(country)
+            if state is None:
+                canonizer = canonization.CountryCanonizer(country_phone, cache_size=cache_size)
+            else:
+                canonizer = snapshot.canonizer_from_state(country_phone, state, cache_size=cache_size)
+            self._canonizers[key] = canonizer
+        return canonizer
+
+    def all_phones(self, is_strict=True, is_canonized=True):
+        """
+        :return: dict of all country phones, like phone_formats.create_all_phones. builds every country
+        """
+        return dict((country, self.get_phone(country, is_strict, is_canonized)) for country in self.names())
+
+    def all_canonizers(self):
+        """
+        :return: dict of all canonizers, like canonization.create_all_canonizers. builds every country
+        """
+        return dict((country, self.get_canonizer(country)) for country in self.names())
+
+
+# Registry of the builtin countries
+default_registry = CountryRegistry()
+
+
+def get_phone(country, is_strict=True, is_canonized=True):
+    """
+    :return: CountryPhone of a builtin country, see CountryRegistry.get_phone
+    """
+    return default_registry.get_phone(country, is_strict, is_canonized)
+
+
+def get_canonizer(country, cache_size=None):
+    """
+    :return: CountryCanonizer of a builtin country, see CountryRegistry.get_canonizer
+    """
+    return default_registry.get_canonizer(country, cache_size)
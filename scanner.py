@@ -0,0 +1,204 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# scanner.py
+# Finds separator tolerant phone
+# numbers in linear time, without
+# backtracking regexes
+#
+##################################
+
+import re, phone_formats, format_trie
+from finder import FoundPhone
+
+DIGITS = frozenset('0123456789')
+# Characters that are not allowed in phone_formats.GENERAL_SEPARATOR ([^\d\s,])
+NON_SEPARATORS = frozenset('0123456789 \t\n\r\f\v,')
+MAX_SEPARATOR_LENGTH = 2
+
+# Digits that are not glued to a previous digit: the only places a phone number can start
+_START_REGEX = re.compile(r'(?<!\d)\d')
+
+
+class _Target(object):
+    """
+    A single phone kind of a single country, and the shape of its find regex
+    (see FormatList._create_full_pattern)
+    """
+
+    def __init__(self, country, kind, country_phone, is_strict, is_canonized, with_country, optional_country,
+                 stuck_zero):
+        self.country = country
+        self.kind = kind
+
+        phone = getattr(country_phone, kind + '_phone')
+        self.trie = format_trie.FormatTrie((phone, phone_format) for phone_format in phone.formats)
+
+        is_canonized = phone_formats._stronger_value(country_phone._is_canonized, is_canonized)
+        is_strict = phone_formats._stronger_value(country_phone._is_strict, is_strict)
+        country_code = country_phone.country_code if with_country else ''
+
+        self.max_separator = 0 if is_canonized else MAX_SEPARATOR_LENGTH
+        self.country_code = country_code
+        self.leading_zeroes = True
+        self.optional_country = True
+        self.stuck_zeroes = stuck_zero
+
+        if is_strict and country_code:
+            self.optional_country = False
+            if is_canonized:
+                self.stuck_zeroes = False
+            elif optional_country:
+                self.optional_country = True
+            else:
+                self.leading_zeroes = False
+        elif not country_code:
+            self.stuck_zeroes = False
+
+        # when nothing starts with 0, giving back zeroes can never help
+        self.zero_led = country_code.startswith('0') or any(literal.startswith('0')
+                                                            for literal in self.trie.literals())
+
+    def _skip_separator(self, text, position, endpos):
+        """
+        :return: position of the digit after the separator starting at position, or None
+        """
+        end = min(position + self.max_separator + 1, endpos)
+        for index in xrange(position, end):
+            char = text[index]
+            if char in DIGITS:
+                return index
+            if char in NON_SEPARATORS:
+                return None
+        return None
+
+    def _zero_choices(self, text, position, endpos, allowed):
+        """
+        :return: positions after 0*, greedy first
+        """
+        if not allowed:
+            return position,
+        end = position
+        while end < endpos and text[end] == '0':
+            end += 1
+        if not self.zero_led:
+            return end,
+        return xrange(end, position - 1, -1)
+
+    def _match_alternatives(self, text, position, endpos):
+        """
+        :return: end of the first format matching at position, by regex priority, or None
+        """
+        candidates = []
+        node = self.trie._root
+        index = position
+        while node is not None:
+            for order, min_length, max_length, format_match in node.get(format_trie._FORMATS, ()):
+                candidates.append((order, -index, min_length, max_length))
+            if index >= endpos:
+                break
+            node = node.get(text[index])
+            index += 1
+
+        candidates.sort()
+        for order, prefix_end, min_length, max_length in candidates:
+            end = self._match_digits(text, -prefix_end, endpos, min_length, max_length)
+            if end is not None:
+                return end
+        return None
+
+    def _match_digits(self, text, position, endpos, min_length, max_length):
+        """
+        matches the digits of a format (separators allowed between them) followed by a non digit
+        :return: end of the longest such run, or None
+        """
+        digit = self._skip_separator(text, position, endpos)
+        ends = []
+        while digit is not None and len(ends) < max_length:
+            ends.append(digit + 1)
+            if digit + 1 >= endpos:
+                break
+            digit = self._skip_separator(text, digit + 1, endpos)
+
+        for count in xrange(len(ends), min_length - 1, -1):
+            end = ends[count - 1]
+            if end >= endpos or text[end] not in DIGITS:
+                return end
+        return None
+
+    def match_at(self, text, start, endpos):
+        """
+        :return: end of the phone number starting at start, or None
+        """
+        for position in self._zero_choices(text, start, endpos, self.leading_zeroes):
+            country_code = self.country_code
+            if country_code and text.startswith(country_code, position, endpos):
+                after_country = self._skip_separator(text, position + len(country_code), endpos)
+                if after_country is not None:
+                    for national in self._zero_choices(text, after_country, endpos, self.stuck_zeroes):
+                        end = self._match_alternatives(text, national, endpos)
+                        if end is not None:
+                            return end
+            if not country_code or self.optional_country:
+                # zeroes before the alternatives were already given back by the leading 0*
+                end = self._match_alternatives(text, position, endpos)
+                if end is not None:
+                    return end
+        return None
+
+
+class LinearScanner(object):
+    """
+    Drop in replacement of finder.PhoneFinder, built for separator tolerant (non canonized) patterns.
+    Instead of backtracking regexes, every possible start is walked once over the digits and separators,
+    so scanning time is linear in the text length, whatever the text looks like.
+    Formats whose prefixes can't be compiled to a FormatTrie are not supported
+    """
+
+    KINDS = ('mobile', 'line')
+
+    def __init__(self, country_phones=None, is_strict=None, is_canonized=None, with_country=True,
+                 optional_country=False, stuck_zero=False):
+        """
+        params are the same as finder.PhoneFinder
+        :raise ValueError: when a prefix can't be compiled to a FormatTrie
+        """
+        if country_phones is None:
+            country_phones = phone_formats.create_all_phones()
+
+        self.countries = sorted(country_phones)
+        self.options = dict(is_strict=is_strict, is_canonized=is_canonized, with_country=with_country,
+                            optional_country=optional_country, stuck_zero=stuck_zero)
+        self._targets = [_Target(country, kind, country_phones[country], is_strict, is_canonized, with_country,
+                                 optional_country, stuck_zero)
+                         for country in self.countries for kind in self.KINDS]
+
+    def __repr__(self):
+        return 'LinearScanner({0})'.format(', '.join(self.countries))
+
+    def finditer(self, text, pos=0, endpos=None):
+        """
+        :param text: text to look for phone numbers in
+        :return: generator of FoundPhone, by order of appearance
+        """
+        if endpos is None:
+            endpos = len(text)
+
+        search_from = pos
+        for start_match in _START_REGEX.finditer(text, pos, endpos):
+            start = start_match.start()
+            if start < search_from:
+                continue
+            for target in self._targets:
+                end = target.match_at(text, start, endpos)
+                if end is not None:
+                    yield FoundPhone(text[start:end], target.country, target.kind, start, end)
+                    search_from = end
+                    break
+
+    def findall(self, text):
+        """
+        :return: list of FoundPhone found in text
+        """
+        return list(self.finditer(text))
@@ -0,0 +1,233 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# slowlog.py
+# Captures inputs that are slow to
+# canonize or to search, and replays
+# them against the current code
+# run: python slowlog.py FILE
+#
+##################################
+
+import sys, json, time, hashlib, argparse, collections, instrumentation, registry, finder, scanner
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_REPEAT = 3
+
+# Finder classes by name, for replaying find entries
+ENGINES = {'PhoneFinder': finder.PhoneFinder, 'LinearScanner': scanner.LinearScanner}
+
+
+def _encode_entry(entry):
+    """
+    :return: JSON safe copy of entry. byte strings are kept as latin-1, so they are read back byte for byte
+    """
+    encoded = dict(entry)
+    value = entry['input']
+    encoded['unicode'] = isinstance(value, unicode)
+    if not encoded['unicode']:
+        encoded['input'] = str(value).decode('latin-1')
+    return encoded
+
+
+def _decode_entry(encoded):
+    entry = dict(encoded)
+    if not entry.pop('unicode', False):
+        entry['input'] = entry['input'].encode('latin-1')
+    return entry
+
+
+class SlowInputRecorder(object):
+    """
+    Records the inputs that took longer than a threshold, with their timing and the canonizer or finder involved.
+    Entries are kept in a ring buffer of max_entries (the oldest are dropped),
+    and appended to a JSON lines file when a path is given.
+    Only watched objects are timed, others run without any overhead
+    """
+
+    def __init__(self, threshold, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+        """
+        :param threshold: seconds an input must take to be recorded
+        :param max_entries: size of the ring buffer
+        :param path: optional JSON lines file, every recorded entry is appended to it
+        """
+        self.threshold = threshold
+        self.path = path
+        self.recorded = 0
+        self._entries = collections.deque(maxlen=max_entries)
+
+    def __repr__(self):
+        return 'SlowInputRecorder(threshold={0})'.format(self.threshold)
+
+    def entries(self):
+        """
+        :return: list of the recorded entries in the buffer, oldest first. every entry is a dict of
+        operation (canonize or find), target (country or finder class), input, seconds and time,
+        and for find entries the countries and options of the finder
+        """
+        return list(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def record(self, operation, target, value, seconds, **fields):
+        """
+        records an input if it took at least threshold seconds
+        :return: True if recorded
+        """
+        if seconds < self.threshold:
+            return False
+
+        entry = dict(fields, operation=operation, target=target, input=value, seconds=seconds, time=time.time())
+        self._entries.append(entry)
+        self.recorded += 1
+        if self.path is not None:
+            with open(self.path, 'a') as log_file:
+                log_file.write(json.dumps(_encode_entry(entry), sort_keys=True) + '\n')
+        return True
+
+    def watch_canonizer(self, canonizer, name=None):
+        """
+        times every canonization of canonizer (canonize, canonize_with_code and canonize_column),
+        except the ones served by its cache. don't enable or disable its instrumentation while watched
+        :param name: country name to record, defaults to the country of the canonizer
+        :return: canonizer
+        """
+        if name is None:
+            name = canonizer._country_phone.country
+        canonize_parts = canonizer._canonize_parts
+        record = self.record
+        clock = instrumentation.clock
+
+        def timed_canonize_parts(phone_number):
+            start = clock()
+            result = canonize_parts(phone_number)
+            seconds = clock() - start
+            if seconds >= self.threshold and isinstance(phone_number, basestring):
+                record('canonize', name, phone_number, seconds)
+            return result
+
+        canonizer._canonize_parts = timed_canonize_parts
+        return canonizer
+
+    def watch_finder(self, phone_finder):
+        """
+        times every search of a finder.PhoneFinder or scanner.LinearScanner (finditer and findall).
+        the time of a search is the time spent inside the finder, until the last phone was found
+        :return: phone_finder
+        """
+        finditer = phone_finder.finditer
+        record = self.record
+        clock = instrumentation.clock
+        target = type(phone_finder).__name__
+
+        def timed_finditer(text, pos=0, endpos=None):
+            seconds = 0.0
+            found = finditer(text, pos, endpos)
+            while True:
+                start = clock()
+                try:
+                    found_phone = next(found)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += clock() - start
+                yield found_phone
+
+            if seconds >= self.threshold:
+                record('find', target, text[pos:endpos], seconds, countries=phone_finder.countries,
+                       options=phone_finder.options)
+
+        phone_finder.finditer = timed_finditer
+        return phone_finder
+
+    @staticmethod
+    def unwatch(watched):
+        """
+        stops timing a watched canonizer or finder
+        """
+        for attribute in ('_canonize_parts', 'finditer'):
+            if attribute in vars(watched):
+                delattr(watched, attribute)
+
+
+def load_entries(path):
+    """
+    :return: list of the entries of a JSON lines file written by SlowInputRecorder
+    """
+    with open(path) as log_file:
+        return [_decode_entry(json.loads(line)) for line in log_file if line.strip()]
+
+
+def _resolve_country(country_registry, name):
+    """
+    :return: registry name of a recorded country. canonizers record the country of their formats,
+    which is not always the registry name
+    """
+    if name in country_registry:
+        return name
+    for registry_name, definition in sorted(country_registry.definitions().iteritems()):
+        if definition['country'] == name:
+            return registry_name
+    raise ValueError('Unknown country {0!r}'.format(name))
+
+
+def _create_function(entry, country_registry):
+    """
+    :return: function that runs the operation of entry on an input
+    """
+    if entry['operation'] == 'canonize':
+        canonizer = country_registry.get_canonizer(_resolve_country(country_registry, entry['target']))
+        return canonizer.canonize_with_code
+
+    country_phones = dict((country, country_registry.get_phone(_resolve_country(country_registry, country)))
+                          for country in entry['countries'])
+    return ENGINES[entry['target']](country_phones, **entry['options']).findall
+
+
+def replay(entries, repeat=DEFAULT_REPEAT, country_registry=None):
+    """
+    Runs every entry again, on the current code
+    :param entries: list of recorded entries (see SlowInputRecorder.entries and load_entries)
+    :param repeat: times to run every input, the fastest run is reported
+    :param country_registry: registry.CountryRegistry of the recorded countries, defaults to the builtin one
+    :return: generator of dicts of operation, target, input_length, input_sha1 (identity of the input),
+    recorded_seconds and seconds
+    """
+    if country_registry is None:
+        country_registry = registry.default_registry
+
+    functions = {}
+    for entry in entries:
+        key = (entry['operation'], entry['target'], tuple(entry.get('countries', ())),
+               tuple(sorted(entry.get('options', {}).iteritems())))
+        if key not in functions:
+            functions[key] = _create_function(entry, country_registry)
+        function = functions[key]
+
+        value = entry['input']
+        timings = []
+        for _ in xrange(repeat):
+            start = instrumentation.clock()
+            function(value)
+            timings.append(instrumentation.clock() - start)
+
+        digest_input = value.encode('utf-8') if isinstance(value, unicode) else value
+        yield {'operation': entry['operation'], 'target': entry['target'], 'input_length': len(value),
+               'input_sha1': hashlib.sha1(digest_input).hexdigest(), 'recorded_seconds': entry['seconds'],
+               'seconds': min(timings)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a file of slow inputs, print timings as JSON lines')
+    parser.add_argument('path', help='JSON lines file written by SlowInputRecorder')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs of every input (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    for result in replay(load_entries(args.path), repeat=args.repeat):
+        sys.stdout.write(json.dumps(result, sort_keys=True) + '\n')
+
+
+if __name__ == '__main__':
+    main()
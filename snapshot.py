@@ -0,0 +1,108 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# snapshot.py
+# Saves initialized canonizers to
+# disk, and loads them without
+# generating their patterns again
+#
+##################################
+
+import zlib, json, phone_formats, canonization
+
+# Must be changed whenever the generated patterns or the snapshot state change
+SNAPSHOT_VERSION = 5
+
+
+class SnapshotError(ValueError):
+    """
+    Raised for snapshots that can't be used: unreadable, of another version, or of formats that changed since
+    """
+
+
+def _byte_strings(value):
+    """
+    json gives unicode strings. turns them back to the byte strings the canonizer was built with
+    """
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, list):
+        return [_byte_strings(item) for item in value]
+    if isinstance(value, dict):
+        return dict((_byte_strings(key), _byte_strings(item)) for key, item in value.iteritems())
+    return value
+
+
+def save_snapshot(canonizers, path):
+    """
+    :param canonizers: dict of country name to CountryCanonizer, like create_all_canonizers()
+    :param path: file to write the snapshot to (zlib compressed json, never code)
+    """
+    snapshot = {'version': SNAPSHOT_VERSION,
+                'countries': dict((country, canonizer.snapshot_state())
+                                  for country, canonizer in canonizers.iteritems())}
+    with open(path, 'wb') as snapshot_file:
+        snapshot_file.write(zlib.compress(json.dumps(snapshot, sort_keys=True)))
+
+
+def read_snapshot(path):
+    """
+    :return: dict of country name to canonizer state (see CountryCanonizer.snapshot_state)
+    :raise SnapshotError: when the file is not a snapshot of this version
+    """
+    with open(path, 'rb') as snapshot_file:
+        data = snapshot_file.read()
+    try:
+        snapshot = _byte_strings(json.loads(zlib.decompress(data)))
+    except (zlib.error, ValueError) as error:
+        raise SnapshotError('{0} is not a snapshot: {1}'.format(path, error))
+
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        raise SnapshotError('{0} is not a version {1} snapshot'.format(path, SNAPSHOT_VERSION))
+    return snapshot['countries']
+
+
+def canonizer_from_state(country_phone, state, cache_size=None):
+    """
+    :return: CountryCanonizer of a single snapshot state
+    :raise SnapshotError: when the formats of country_phone changed since the snapshot was taken
+    """
+    try:
+        return canonization.CountryCanonizer.from_snapshot_state(country_phone, state, cache_size=cache_size)
+    except ValueError as error:
+        raise SnapshotError(str(error))
+
+
+def load_snapshot(path, country_phones=None, countries=None, cache_size=None):
+    """
+    :param country_phones: dict of country name to the CountryPhone the snapshot was taken of.
+    defaults to the builtin country definitions
+    :param countries: names of the countries to load, defaults to all countries of the snapshot
+    :param cache_size: see CountryCanonizer
+    :return: dict of country name to CountryCanonizer
+    :raise SnapshotError: when the snapshot is of another version, misses a country,
+    or the formats of a country changed since
+    """
+    states = read_snapshot(path)
+    if countries is None:
+        countries = states.keys()
+
+    canonizers = {}
+    for country in countries:
+        if country not in states:
+            raise SnapshotError('{0} has no snapshot of {1!r}'.format(path, country))
+        if country_phones is not None:
+            country_phone = country_phones[country]
+        elif country in phone_formats.country_definitions():
+            country_phone = phone_formats.create_country_phone(phone_formats.country_definitions()[country])
+        else:
+            raise SnapshotError('{0!r} of {1} is not defined anymore'.format(country, path))
+        canonizers[country] = canonizer_from_state(country_phone, states[country], cache_size=cache_size)
+
+    return canonizers
+
+
+if __name__ == '__main__':
+    import sys
+    save_snapshot(canonization.create_all_canonizers(), sys.argv[1])
@@ -0,0 +1,143 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# streaming.py
+# Finds phone numbers in big files
+# and iterators, chunk by chunk
+#
+##################################
+
+import os, mmap, stat, collections, finder
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# Must be longer than any phone number (and its leading zeroes), so a number is never cut in two
+DEFAULT_OVERLAP = 256
+
+StreamMatch = collections.namedtuple('StreamMatch', ['offset', 'phone', 'country'])
+
+
+def _iter_mmap_chunks(file_obj, chunk_size):
+    """
+    reads a regular file through mmap, chunk by chunk
+    """
+    mapped = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for offset in xrange(0, len(mapped), chunk_size):
+            yield mapped[offset:offset + chunk_size]
+    finally:
+        mapped.close()
+
+
+def _iter_file_chunks(file_obj, chunk_size):
+    """
+    reads any file like object, chunk by chunk
+    """
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _iter_line_chunks(lines, chunk_size):
+    """
+    groups lines into chunks of at least chunk_size characters
+    """
+    parts = []
+    size = 0
+    for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield ''.join(parts)
+
+
+def iter_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    :param source: file path, file object or iterator of lines
+    :return: generator of consecutive chunks of the source. regular files are read through mmap
+    """
+    if isinstance(source, basestring):
+        with open(source, 'rb') as file_obj:
+            file_stat = os.fstat(file_obj.fileno())
+            if stat.S_ISREG(file_stat.st_mode) and file_stat.st_size > 0:
+                chunks = _iter_mmap_chunks(file_obj, chunk_size)
+            else:
+                chunks = _iter_file_chunks(file_obj, chunk_size)
+            for chunk in chunks:
+                yield chunk
+    elif hasattr(source, 'read'):
+        for chunk in _iter_file_chunks(source, chunk_size):
+            yield chunk
+    else:
+        for chunk in _iter_line_chunks(source, chunk_size):
+            yield chunk
+
+
+def iter_file_spans(path, phone_finder=None):
+    """
+    Finds phone numbers in a file through a single mmap, without decoding or copying it.
+    unlike iter_phones, offsets are in bytes, so they point back into the file
+    :param phone_finder: PhoneFinder instance, defaults to a finder of all countries
+    :return: generator of finder.FoundSpan (start, end, normalized, country, kind)
+    """
+    if phone_finder is None:
+        phone_finder = finder.PhoneFinder()
+
+    with open(path, 'rb') as file_obj:
+        if os.fstat(file_obj.fileno()).st_size == 0:
+            return
+        mapped = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for found_span in phone_finder.iterspans(mapped):
+                yield found_span
+        finally:
+            mapped.close()
+
+
+def iter_phones(source, phone_finder=None, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_OVERLAP):
+    """
+    Finds phone numbers in source without loading it whole.
+    Consecutive chunks overlap, and a number is reported only by the chunk in which it is complete,
+    so numbers crossing a chunk boundary are neither lost nor duplicated.
+    :param source: file path, file object or iterator of lines
+    :param phone_finder: PhoneFinder instance, defaults to a finder of all countries
+    :param overlap: characters kept between chunks. must be longer than any phone number
+    :return: generator of StreamMatch (offset, phone, country), offset is absolute in the source
+    """
+    if phone_finder is None:
+        phone_finder = finder.PhoneFinder()
+    if chunk_size <= overlap:
+        raise ValueError('chunk_size must be bigger than overlap')
+
+    buf = ''
+    base = 0  # absolute offset of buf[0]
+    pos = 0  # position in buf from which scanning goes on
+
+    for chunk in iter_chunks(source, chunk_size):
+        buf += chunk
+        cut = len(buf) - overlap
+        if cut <= pos:
+            continue
+
+        # Numbers starting before cut are complete, the others are left for the next chunk
+        for found in phone_finder.finditer(buf, pos):
+            if found.start >= cut:
+                break
+            yield StreamMatch(base + found.start, found.phone, found.country)
+            pos = found.end
+        pos = max(pos, cut)
+
+        # Keep one character before pos, the finder looks behind it for a glued digit
+        keep_from = max(pos - 1, 0)
+        buf = buf[keep_from:]
+        base += keep_from
+        pos -= keep_from
+
+    for found in phone_finder.finditer(buf, pos):
+        yield StreamMatch(base + found.start, found.phone, found.country)
@@ -0,0 +1,88 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# test_canonization.py
+# Differential checks of the regex
+# free fast path of the canonizers
+# run: python -m unittest discover
+#
+##################################
+
+import random, unittest, benchmarks, canonization, corpus, phone_formats
+
+
+class FastPathTest(unittest.TestCase):
+    """
+    CountryCanonizer._canonize_fast against the regex pipeline (_canonize_regexes), and canonize() against
+    a canonizer without fast path, on the seeded inputs of benchmarks.bench_fast_path
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(benchmarks.FAST_PATH_SEED)
+        cls.countries = []
+        for country, country_phone in sorted(phone_formats.create_all_phones().iteritems()):
+            canonizer = canonization.CountryCanonizer(country_phone)
+            regex_canonizer = canonization.CountryCanonizer(country_phone)
+            regex_canonizer._format_trie = None
+            inputs = benchmarks._fast_path_inputs(corpus.PhoneCorpus(country_phone), rng, benchmarks.NUMBERS_COUNT)
+            cls.countries.append((country, canonizer, regex_canonizer, inputs))
+
+    def test_fast_path_is_used(self):
+        for country, canonizer, regex_canonizer, inputs in self.countries:
+            self.assertIsNotNone(canonizer._format_trie, country)
+
+    def test_same_as_regexes(self):
+        mismatches = []
+        for country, canonizer, regex_canonizer, inputs in self.countries:
+            reversing_regex = canonizer._regexes_dict['reversed'][0]
+            for name, numbers in sorted(inputs.iteritems()):
+                if name in ('unicode', 'newline'):
+                    continue
+                for number in numbers:
+                    fast = canonizer._canonize_fast(number)
+                    if fast is None:
+                        continue
+                    if fast != canonizer._canonize_regexes(number):
+                        mismatches.append((country, name, number))
+                    elif name == 'reversed' and reversing_regex.search(number):
+                        # reversed numbers must be declined, the reversing regex changes them
+                        mismatches.append((country, name, number))
+        self.assertEqual(mismatches, [])
+
+    def test_canonize_same_as_regex_pipeline(self):
+        mismatches = []
+        for country, canonizer, regex_canonizer, inputs in self.countries:
+            for name, numbers in sorted(inputs.iteritems()):
+                for number in numbers:
+                    if canonizer.canonize_with_code(number) != regex_canonizer.canonize_with_code(number):
+                        mismatches.append((country, name, number))
+        self.assertEqual(mismatches, [])
+
+    def test_unicode_and_newlines_skip_fast_path(self):
+        for country, canonizer, regex_canonizer, inputs in self.countries:
+            fast_calls = []
+
+            def counting_canonize_fast(phone_number):
+                fast_calls.append(phone_number)
+                return canonization.CountryCanonizer._canonize_fast(canonizer, phone_number)
+            # an instance attribute hides the method, like enable_instrumentation does
+            canonizer._canonize_fast = counting_canonize_fast
+            try:
+                for number in inputs['unicode'] + inputs['newline']:
+                    canonizer.canonize(number)
+            finally:
+                del canonizer._canonize_fast
+            # the digit runs of an extracted number are byte strings without newlines, and may take it
+            self.assertEqual([phone_number for phone_number in fast_calls
+                              if isinstance(phone_number, unicode) or '\n' in phone_number], [], country)
+
+    def test_declines_some(self):
+        # the reversed inputs exercise the regex fallback of _canonize_simple
+        for country, canonizer, regex_canonizer, inputs in self.countries:
+            self.assertTrue(any(canonizer._canonize_fast(number) is None for number in inputs['reversed']), country)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# test_dispatch.py
+# Checks that CountryDispatcher
+# never misses a country that can
+# canonize a number
+# run: python -m unittest discover
+#
+##################################
+
+import random, unittest, canonization, corpus, dispatch
+
+# Pieces of the random inputs, with the starts the trimmer doesn't remove
+PIECES = ['0', '00', '+', ' ', '-', '/', '.', ',', '\t', '(', ')', '(0', ') ', 'tel:', 'tel ', '972', '32', '31', '5',
+          '52', '800', '4', '3', '6']
+RANDOM_INPUTS = 20000
+NUMBERS_PER_KIND = 300
+SEED = 11
+
+
+def _random_inputs(rng, count):
+    """
+    :return: list of count inputs glued out of PIECES and digit runs
+    """
+    inputs = []
+    for _ in xrange(count):
+        parts = []
+        for _ in xrange(rng.randint(1, 6)):
+            if rng.random() < 0.5:
+                parts.append(rng.choice(PIECES))
+            else:
+                parts.append(''.join(rng.choice(corpus.DIGITS) for _ in xrange(rng.randint(1, 9))))
+        inputs.append(''.join(parts))
+    return inputs
+
+
+class CandidatesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dispatcher = dispatch.CountryDispatcher()
+        cls.canonizers = cls.dispatcher._canonizers
+
+    def _missed(self, phone_number):
+        """
+        :return: countries that canonize phone_number, but are not candidates of it
+        """
+        candidates = self.dispatcher.candidates(phone_number)
+        return [country for country, canonizer in sorted(self.canonizers.iteritems())
+                if country not in candidates and
+                canonizer.canonize_with_code(phone_number)[1] != canonization.CountryCanonizer.NOTHING]
+
+    def test_examples(self):
+        for phone_number in ['(052) 8197720', 'tel:0528197720', 'tel 052-8197720', '052-8197720/21', '(00972) 528197720',
+                             '52 819 7720']:
+            self.assertIn('israel', self.dispatcher.candidates(phone_number), phone_number)
+
+    def test_too_long(self):
+        self.assertEqual(self.dispatcher.candidates('052 81977205555'), [])
+
+    def test_random_inputs(self):
+        rng = random.Random(SEED)
+        missed = [(phone_number, self._missed(phone_number)) for phone_number in _random_inputs(rng, RANDOM_INPUTS)]
+        self.assertEqual([miss for miss in missed if miss[1]], [])
+
+    def test_corpus_numbers(self):
+        missed = []
+        for country, canonizer in sorted(self.canonizers.iteritems()):
+            phone_corpus = corpus.PhoneCorpus(canonizer._country_phone, SEED)
+            for kind in corpus.NUMBER_KINDS:
+                for number in phone_corpus.numbers(NUMBERS_PER_KIND, kind):
+                    for phone_number in (number, '(' + number, 'tel:' + number, unicode(number)):
+                        missed.append((phone_number, self._missed(phone_number)))
+        self.assertEqual([miss for miss in missed if miss[1]], [])
+
+
+class CanonizeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dispatcher = dispatch.CountryDispatcher()
+        cls.canonizers = cls.dispatcher._canonizers
+
+    def test_ambiguous(self):
+        countries, canonized, code = self.dispatcher.canonize_with_code('052-8197720/21')
+        self.assertEqual(countries, ('holland', 'israel'))
+        self.assertTrue({'972528197720', '972528197721'} <= canonized)
+        self.assertEqual(self.dispatcher.canonize('03-6293577'),
+                         (('belgium', 'israel'), {'3236293577', '97236293577'}))
+
+    def test_country_code(self):
+        self.assertEqual(self.dispatcher.canonize('+972528197720'), (('israel',), {'972528197720'}))
+        self.assertEqual(self.dispatcher.canonize_with_code('hello'),
+                         ((), None, canonization.CountryCanonizer.NOTHING))
+        self.assertEqual(self.dispatcher.canonize_all_with_code(None), [])
+
+    def test_random_inputs(self):
+        rng = random.Random(SEED)
+        wrong = []
+        for phone_number in _random_inputs(rng, RANDOM_INPUTS):
+            results = dict((country, canonizer.canonize_with_code(phone_number))
+                           for country, canonizer in self.canonizers.iteritems())
+            successful = sorted(country for country, (canonized, code) in results.iteritems()
+                                if code != canonization.CountryCanonizer.NOTHING)
+            # the first country whose code starts the number, else all of them
+            by_code = self.dispatcher._split_candidates(phone_number)[0]
+            expected = [country for country in by_code if country in successful][:1] or successful
+            expected_results = [(country,) + results[country] for country in expected]
+            if self.dispatcher.canonize_all_with_code(phone_number) != expected_results:
+                wrong.append(phone_number)
+        self.assertEqual(wrong, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
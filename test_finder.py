@@ -0,0 +1,86 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# test_finder.py
+# Checks PhoneFinder over many
+# countries, beyond the groups
+# limit of a single regex
+# run: python -m unittest discover
+#
+##################################
+
+import random, unittest, corpus, finder, phone_formats
+
+SYNTHETIC_COUNTRIES = 200
+WORDS = 3000
+SEED = 13
+# options of the finders that are checked, like the ones of CountryPhone.to_find_regex
+FINDER_OPTIONS = [{}, dict(is_canonized=False), dict(optional_country=True), dict(with_country=False),
+                  dict(stuck_zero=True), dict(is_strict=False, is_canonized=False, optional_country=True),
+                  dict(prefilter=False)]
+
+
+def _synthetic_phones(count):
+    """
+    :return: dict of country name to CountryPhone, of count copies of the builtin countries with made up
+    country codes (like benchmarks._write_synthetic_countries)
+    """
+    builtin = phone_formats.country_definitions()
+    phones = {}
+    for country_index in xrange(count):
+        name = sorted(builtin)[country_index % len(builtin)]
+        country = '{0}_{1}'.format(name, country_index)
+        definition = dict(builtin[name], country=country, country_code=str(100 + country_index))
+        phones[country] = phone_formats.create_country_phone(definition)
+    return phones
+
+
+def _texts(seed):
+    """
+    :return: list of prose texts of every builtin country, canonized and with separators
+    """
+    texts = []
+    for is_canonized in (True, False):
+        for country, country_phone in sorted(phone_formats.create_all_phones(is_canonized=is_canonized).iteritems()):
+            texts.append(corpus.PhoneCorpus(country_phone, seed).prose(WORDS, 0.05))
+    return texts
+
+
+class SplitRegexesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.max_groups = finder.MAX_GROUPS
+
+    def tearDown(self):
+        finder.MAX_GROUPS = self.max_groups
+
+    def test_same_as_single_regex(self):
+        texts = _texts(SEED)
+        for options in FINDER_OPTIONS:
+            finder.MAX_GROUPS = self.max_groups
+            single = finder.PhoneFinder(**options)
+            self.assertEqual(len(single.patterns), 1)
+            expected = [single.findall(text) for text in texts]
+            for max_groups in (1, 2, 4):
+                finder.MAX_GROUPS = max_groups
+                split = finder.PhoneFinder(**options)
+                self.assertTrue(len(split.patterns) > 1)
+                self.assertEqual([split.findall(text) for text in texts], expected, (options, max_groups))
+
+    def test_synthetic_countries(self):
+        country_phones = _synthetic_phones(SYNTHETIC_COUNTRIES)
+        rng = random.Random(SEED)
+        for options in ({}, dict(is_canonized=False)):
+            phone_finder = finder.PhoneFinder(country_phones, **options)
+            self.assertTrue(len(phone_finder.patterns) > 1)
+            for country, country_phone in sorted(country_phones.iteritems()):
+                prefix, number = corpus.PhoneCorpus(country_phone, rng.random()).national()
+                phone = country_phone.country_code + prefix + number
+                found = phone_finder.findall('call {0} now'.format(phone))
+                self.assertEqual([(found_phone.phone, found_phone.country) for found_phone in found],
+                                 [(phone, country)])
+
+
+if __name__ == '__main__':
+    unittest.main()
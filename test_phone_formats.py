@@ -0,0 +1,90 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# test_phone_formats.py
+# Checks that the prefix factored
+# alternatives match the same as
+# the plain OR-ed ones
+# run: python -m unittest discover
+#
+##################################
+
+import re, random, unittest, benchmarks, canonization, corpus, phone_formats
+
+NUMBERS_PER_KIND = 500
+WORDS = 5000
+
+
+class FactoringTest(unittest.TestCase):
+    """
+    FormatList._create_factored_regex against _or_regexes, on the seeded random format lists of
+    benchmarks.bench_factoring
+    """
+
+    def test_random_format_lists(self):
+        rng = random.Random(benchmarks.FACTORING_SEED)
+        factored_lists = 0
+        mismatches = []
+        for _ in xrange(benchmarks.FACTORING_LISTS):
+            format_list = benchmarks._random_format_list(rng)
+            factored = format_list._create_factored_regex()
+            plain = format_list._or_regexes(format_list._create_regexes(True))
+            if factored is None or factored == plain:
+                continue
+            factored_lists += 1
+            factored_exact, plain_exact = re.compile('^{0}$'.format(factored)), re.compile('^{0}$'.format(plain))
+            factored_find = re.compile(r'(?<!\d){0}(?!\d)'.format(factored))
+            plain_find = re.compile(r'(?<!\d){0}(?!\d)'.format(plain))
+            for _ in xrange(NUMBERS_PER_KIND):
+                digits = ''.join(rng.choice(corpus.DIGITS) for _ in xrange(rng.randint(0, 12)))
+                text = 'x' + digits + ' ' + digits[::-1] + 'y'
+                if bool(factored_exact.match(digits)) != bool(plain_exact.match(digits)):
+                    mismatches.append((plain, digits))
+                if ([match.span() for match in factored_find.finditer(text)] !=
+                        [match.span() for match in plain_find.finditer(text)]):
+                    mismatches.append((plain, text))
+        self.assertTrue(factored_lists > benchmarks.FACTORING_LISTS // 2)
+        self.assertEqual(mismatches, [])
+
+
+class AlternationTest(unittest.TestCase):
+    """
+    The exact regex, the find regex and the canonizer regex pipeline of every country, with factored
+    alternatives and with plain ones (FormatList.factor_alternatives)
+    """
+
+    @staticmethod
+    def _results(factored):
+        """
+        :return: dict of (country, check) to its results
+        """
+        phone_formats.FormatList.factor_alternatives = factored
+        try:
+            canonizers = canonization.create_all_canonizers()
+            results = {}
+            for country, country_phone in sorted(phone_formats.create_all_phones().iteritems()):
+                phone_corpus = corpus.PhoneCorpus(country_phone)
+                text = phone_corpus.prose(WORDS, 0.05)
+                numbers = [number for kind in corpus.NUMBER_KINDS
+                           for number in phone_corpus.numbers(NUMBERS_PER_KIND, kind)]
+                exact_regex = country_phone.to_exact_regex()
+                find_regex = country_phone.to_find_regex()
+                results[country, 'exact'] = [exact_regex.search(number) is not None for number in numbers]
+                results[country, 'find'] = [match.span('phone') for match in find_regex.finditer(text)]
+                results[country, 'canonize'] = [canonizers[country]._canonize_regexes(number) for number in numbers]
+            return results
+        finally:
+            phone_formats.FormatList.factor_alternatives = True
+
+    def test_same_as_plain(self):
+        factored_results = self._results(True)
+        plain_results = self._results(False)
+        self.assertEqual(sorted(factored_results), sorted(plain_results))
+        for key in sorted(plain_results):
+            self.assertTrue(plain_results[key], key)
+            self.assertEqual(factored_results[key], plain_results[key], key)
+
+
+if __name__ == '__main__':
+    unittest.main()
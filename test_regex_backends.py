@@ -0,0 +1,90 @@
+# -*- encoding: utf-8 -*-
+
+##################################
+#
+# test_regex_backends.py
+# Checks that patterns relying on
+# re behaviors are not compiled by
+# backends without them
+# run: python -m unittest discover
+#
+##################################
+
+import re, unittest, canonization, corpus, finder, phone_formats, regex_backends
+
+NUMBERS_PER_KIND = 200
+
+
+class _EndAtTextEnd(object):
+    """
+    stand in regex module whose '$' only matches at the very end of the text, like RE2
+    """
+    error = re.error
+
+    @staticmethod
+    def compile(pattern, flags=0):
+        return re.compile(pattern.replace('$', '\\Z'), flags)
+
+
+def _results(backend_names):
+    """
+    :return: list of the exact regex, classify regex and canonizer results of numbers with newlines,
+    with the patterns compiled by the given backends
+    """
+    previous = regex_backends.set_backends(backend_names)
+    try:
+        canonizers = canonization.create_all_canonizers()
+        results = []
+        for country, country_phone in sorted(phone_formats.create_all_phones().iteritems()):
+            phone_corpus = corpus.PhoneCorpus(country_phone)
+            numbers = []
+            for kind in corpus.NUMBER_KINDS:
+                for number in phone_corpus.numbers(NUMBERS_PER_KIND, kind):
+                    numbers.extend([number + '\n', '\n' + number])
+            exact_regex = country_phone.to_exact_regex()
+            classify_regex, tags = country_phone._create_classify_regex(country_phone.country_code)
+            for number in numbers:
+                classify_match = classify_regex.search(number)
+                results.append((country, number, exact_regex.search(number) is not None,
+                                classify_match and classify_match.lastgroup,
+                                canonizers[country].canonize_with_code(number)))
+        return results
+    finally:
+        regex_backends.set_backends(previous)
+
+
+class UnsupportedFeaturesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backends = regex_backends.BACKENDS.copy()
+
+    def tearDown(self):
+        regex_backends.BACKENDS.clear()
+        regex_backends.BACKENDS.update(self.backends)
+
+    def test_end_before_newline(self):
+        expected = _results([])
+        regex_backends.BACKENDS['re2_like'] = regex_backends.Backend('re2_like', _EndAtTextEnd,
+                                                                     unsupported=regex_backends.RE2_UNSUPPORTED)
+        self.assertEqual(_results(['re2_like']), expected)
+
+        # without the feature, the stand in does change the results
+        regex_backends.BACKENDS['re2_like'] = regex_backends.Backend('re2_like', _EndAtTextEnd)
+        self.assertNotEqual(_results(['re2_like']), expected)
+
+    def test_last_group(self):
+        regex_backends.BACKENDS['re2_like'] = regex_backends.Backend('re2_like', re,
+                                                                     unsupported=regex_backends.RE2_UNSUPPORTED)
+        previous = regex_backends.set_backends(['re2_like'])
+        try:
+            compiled_before = regex_backends.info()
+            finder.PhoneFinder(prefilter=False)
+            compiled = regex_backends.info()
+        finally:
+            regex_backends.set_backends(previous)
+        self.assertEqual(compiled.get('re2_like', 0), compiled_before.get('re2_like', 0))
+        self.assertTrue(compiled['re'] > compiled_before.get('re', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()